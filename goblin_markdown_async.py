@@ -0,0 +1,77 @@
+"""
+Goblin Markdown Converter Async v1.0
+asyncio API for converting Goblin Tools task lists without blocking the event loop.
+"""
+
+import asyncio
+import functools
+import json
+import os
+
+from goblin_markdown_converter import (
+    convert_json_to_markdown,
+    convert_tasks_to_canvas,
+    convert_to_targets,
+    iter_input_tasks
+)
+
+def convert_file_sync(input_file, targets=('markdown',), show_timestamps=False):
+    """Read, convert and write one file; returns {target: output_file}."""
+    base_name = os.path.splitext(input_file)[0]
+    outputs = convert_to_targets(iter_input_tasks(input_file), base_name, targets,
+                                 {'show_timestamps': show_timestamps})
+    return {target: output_file for target, (output_file, _) in outputs.items()}
+
+def convert_tasks_sync(tasks, output_format='markdown', show_timestamps=False):
+    """Convert an in-memory task list to 'markdown' or 'canvas' text."""
+    if output_format == 'markdown':
+        return convert_json_to_markdown(tasks, show_timestamps)
+    if output_format == 'canvas':
+        return json.dumps(convert_tasks_to_canvas(tasks), indent=2)
+    raise ValueError(f"Unknown format: {output_format}")
+
+async def convert_file_async(input_file, targets=('markdown',), show_timestamps=False, executor=None):
+    """Convert one file off the event loop and return {target: output_file}.
+    
+    Reading, rendering and writing all run in `executor`: the loop's default
+    thread pool when None, or e.g. a ProcessPoolExecutor for CPU-bound
+    batches. Errors are raised to the caller.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, functools.partial(convert_file_sync, input_file, tuple(targets), show_timestamps))
+
+async def convert_tasks_async(tasks, output_format='markdown', show_timestamps=False, executor=None):
+    """Convert an in-memory task list off the event loop and return the text."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, functools.partial(convert_tasks_sync, tasks, output_format, show_timestamps))
+
+async def convert_many_async(input_files, targets=('markdown',), show_timestamps=False,
+                             concurrency=8, executor=None):
+    """Convert many files concurrently, yielding results as they complete.
+    
+    At most `concurrency` conversions run at once. Each result is an
+    (input_file, outputs, error) tuple where outputs is {target: output_file}
+    or None and error is a message or None, so one bad file does not stop
+    the rest. Closing or cancelling the iteration cancels every conversion
+    that has not started yet.
+    """
+    semaphore = asyncio.BoundedSemaphore(concurrency)
+    
+    async def convert_one(input_file):
+        async with semaphore:
+            try:
+                outputs = await convert_file_async(input_file, targets, show_timestamps, executor)
+            except Exception as e:
+                return input_file, None, str(e)
+            return input_file, outputs, None
+    
+    pending = [asyncio.create_task(convert_one(input_file)) for input_file in input_files]
+    try:
+        for next_result in asyncio.as_completed(pending):
+            yield await next_result
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,214 @@
+"""
+Goblin Markdown Converter Benchmarks v1.0
+Measures how the conversion pipeline scales on synthetic Goblin Tools exports.
+"""
+
+import argparse
+import json
+import datetime
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import goblin_markdown_converter as converter
+
+CATEGORIES = ["☑️", "🛠", "📋", "🎨", "🏢", "📈", "🤝", "📚", "🖊", "🎓", "💬", "📝", "💵"]
+ESTIMATES = [None, 60, 300, 900, 1800, 3600, 5400, 7200, 28800, 86400]
+BASE_TIMESTAMP = 1700000000000  # Milliseconds, like Goblin Tools exports
+
+def make_task(rng, index, parent_id, mixed=False):
+    """Create one synthetic task; `mixed` adds estimates, timestamps and states."""
+    task = {
+        'id': f"task-{index}",
+        'text': f"Task number {index}",
+        'parentId': parent_id
+    }
+    if mixed:
+        estimate = rng.choice(ESTIMATES)
+        if estimate:
+            task['estimate'] = estimate
+        task['category'] = rng.choice(CATEGORIES)
+        task['timestamp'] = BASE_TIMESTAMP + rng.randrange(90 * 24 * 3600) * 1000
+        task['completed'] = rng.random() < 0.3
+    return task
+
+def generate_flat(size, seed=0):
+    """One root with every other task as a direct child."""
+    rng = random.Random(seed)
+    tasks = [make_task(rng, 0, None)]
+    tasks.extend(make_task(rng, i, "task-0") for i in range(1, size))
+    return tasks
+
+def generate_deep(size, seed=0, depth=1000):
+    """Chains of `depth` nested tasks, each starting at a new root.
+    
+    Depth is capped because markdown indentation makes the output grow with
+    the square of the depth.
+    """
+    rng = random.Random(seed)
+    return [make_task(rng, i, None if i % depth == 0 else f"task-{i - 1}")
+            for i in range(size)]
+
+def generate_many_roots(size, seed=0):
+    """Many small projects: a root with a handful of children each."""
+    rng = random.Random(seed)
+    tasks = []
+    root = None
+    for i in range(size):
+        if root is None or rng.random() < 0.2:
+            root = f"task-{i}"
+            tasks.append(make_task(rng, i, None))
+        else:
+            tasks.append(make_task(rng, i, root))
+    return tasks
+
+def generate_mixed(size, seed=0):
+    """Realistic trees with estimates, timestamps, categories and completed tasks."""
+    rng = random.Random(seed)
+    tasks = []
+    for i in range(size):
+        if i == 0 or rng.random() < 0.05:
+            parent_id = None
+        else:
+            # Favour recent tasks as parents, like Magic ToDo breakdowns
+            parent_id = f"task-{rng.randrange(max(0, i - 50), i)}"
+        tasks.append(make_task(rng, i, parent_id, mixed=True))
+    return tasks
+
+def generate_canvas(size, seed=0):
+    """A large canvas with one edge per non-root node."""
+    return converter.convert_tasks_to_canvas(generate_mixed(size, seed))
+
+SHAPES = {
+    'flat': generate_flat,
+    'deep': generate_deep,
+    'many_roots': generate_many_roots,
+    'mixed': generate_mixed,
+    'canvas': generate_canvas
+}
+
+def render_roots(tasks):
+    """Run generate_markdown over every root, as the old renderer did."""
+    for node in converter.process_tasks(tasks):
+        converter.generate_markdown(node)
+
+def get_stages(shape):
+    """Return the (name, function) stages to run for a shape's input."""
+    if shape == 'canvas':
+        return [('process_canvas_to_tasks', converter.process_canvas_to_tasks)]
+    return [
+        ('process_tasks', converter.process_tasks),
+        ('generate_markdown', render_roots),
+        ('convert_json_to_markdown', converter.convert_json_to_markdown),
+        ('convert_tasks_to_canvas', converter.convert_tasks_to_canvas)
+    ]
+
+def measure(function, data, repeat=3):
+    """Return (best wall time in seconds, peak traced memory in bytes)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    
+    # Memory is traced in a separate run because tracing slows everything down
+    tracemalloc.start()
+    try:
+        function(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+def run_benchmarks(shapes, sizes, repeat=3, seed=0):
+    """Benchmark every stage for every shape and size and return the results."""
+    results = []
+    for shape in shapes:
+        for size in sizes:
+            data = SHAPES[shape](size, seed)
+            for stage, function in get_stages(shape):
+                seconds, peak = measure(function, data, repeat)
+                results.append({
+                    'shape': shape,
+                    'size': size,
+                    'stage': stage,
+                    'seconds': round(seconds, 6),
+                    'peak_bytes': peak
+                })
+                print(f"{shape:<11} {size:>9} {stage:<26} {seconds * 1000:>10.1f} ms "
+                      f"{peak / (1024 * 1024):>9.1f} MiB")
+    return results
+
+def find_regressions(results, baseline, threshold=0.2, min_seconds=0.001):
+    """Compare results against a baseline run and return regression messages.
+    
+    A stage regresses when its time or peak memory grows by more than
+    `threshold` (a fraction). Time differences below `min_seconds` are
+    treated as noise.
+    """
+    previous = {(r['shape'], r['size'], r['stage']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        base = previous.get((result['shape'], result['size'], result['stage']))
+        if base is None:
+            continue
+        label = f"{result['shape']}/{result['size']}/{result['stage']}"
+        if (result['seconds'] > base['seconds'] * (1 + threshold)
+                and result['seconds'] - base['seconds'] > min_seconds):
+            regressions.append(f"{label}: time {base['seconds']:.4f}s -> {result['seconds']:.4f}s")
+        if result['peak_bytes'] > base['peak_bytes'] * (1 + threshold):
+            regressions.append(f"{label}: peak memory {base['peak_bytes']} -> {result['peak_bytes']} bytes")
+    return regressions
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark the Goblin Markdown converter.")
+    parser.add_argument('--shapes', nargs='+', choices=sorted(SHAPES), default=sorted(SHAPES),
+                        help="input shapes to generate (default: all)")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+                        help="number of tasks per input (default: 1000 10000 100000)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="timed runs per stage; the fastest is kept (default: 3)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed for the generators")
+    parser.add_argument('-o', '--output', metavar='FILE', help="save results as JSON to FILE")
+    parser.add_argument('--baseline', metavar='FILE',
+                        help="compare against a previous JSON run and flag regressions")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="allowed slowdown or memory growth before flagging (default: 0.2)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    
+    print(f"{'shape':<11} {'size':>9} {'stage':<26} {'time':>13} {'peak':>13}")
+    results = run_benchmarks(args.shapes, args.sizes, args.repeat, args.seed)
+    
+    if args.output:
+        run = {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'results': results
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print(f"\nNo regressions against {args.baseline}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,321 +3,1114 @@ Goblin Markdown Converter CLI v1.0
 A command-line interface for converting Goblin Tools task lists to Markdown.
 """
 
+import argparse
+import contextlib
+import filecmp
+import glob
+import hashlib
 import json
 import datetime
 import sys
 import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-def format_duration(seconds):
-    """Convert seconds to a human-readable duration string."""
-    if not seconds:
-        return ""
-    
-    # Calculate days, hours, minutes
-    days = seconds // (24 * 3600)
-    remaining = seconds % (24 * 3600)
-    hours = remaining // 3600
-    remaining = remaining % 3600
-    minutes = remaining // 60
-    
-    parts = []
-    if days > 0:
-        parts.append(f"{days}d")
-    if hours > 0:
-        parts.append(f"{hours}h")
-    if minutes > 0:
-        parts.append(f"{minutes}m")
-    if not parts:  # For very short durations
-        parts.append("1m")
-    
-    return " ".join(parts)
-
-def format_estimate(estimate):
-    """Format the time estimate to a string."""
-    if not estimate:
-        return ""
-    duration = format_duration(estimate)
-    return f" ({duration})" if duration else ""
-
-def format_timestamp(timestamp):
-    """Format timestamp to a readable date."""
-    if not timestamp:
-        return ""
-    
-    # Convert milliseconds to seconds if needed
-    if timestamp > 1000000000000:  # If timestamp is in milliseconds
-        timestamp = timestamp / 1000
+from goblin_markdown_converter import (
+    ConversionStats,
+    DEFAULT_FORMATTER,
+    DEFAULT_TIMESTAMP_FORMAT,
+    MERGE_RULES,
+    MULTI_PARENT_POLICIES,
+    NO_STATS,
+    OUTPUT_RENDERERS,
+    TREE_POLICIES,
+    TaskFileIndex,
+    TaskIndex,
+    build_disk_task_tree,
+    build_task_tree,
+    convert_json_to_markdown,
+    convert_tasks_to_canvas,
+    convert_to_targets,
+    format_diagnostics,
+    format_merge_report,
+    format_stats_table,
+    get_formatter,
+    iter_input_tasks,
+    iter_tasks_from_stream,
+    iter_tree_markdown_lines,
+    merge_task_lists,
+    parse_timezone,
+    process_canvas_to_tasks,
+    sync_markdown_to_tasks,
+    write_split_markdown
+)
+
+# Bump when a change to the converter alters its output, to invalidate caches
+CACHE_VERSION = 2
+DEFAULT_CACHE_FILE = '.goblin-cache.json'
+
+# convert_file options that leave the output as it always was
+DEFAULT_CONVERSION = {'show_timestamps': False, 'filters': None, 'rollups': False,
+                      'policy': 'promote', 'multi_parent': 'first', 'compact': False,
+                      'split': False, 'disk': False, 'index': False, 'timezone': None,
+                      'timestamp_format': None, 'id_markers': False}
+
+def get_output_path(input_file, target='markdown'):
+    """Return the path the output in one format for an input file is written to."""
+    base_name = os.path.splitext(input_file)[0]
+    return base_name + OUTPUT_RENDERERS[target]['extension']
+
+def hash_file(file_path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def write_file_atomically(output_file, write):
+    """Write a text file through a temporary file, only if its bytes change.
     
-    try:
-        dt = datetime.datetime.fromtimestamp(timestamp)
-        return dt.strftime("%Y-%m-%d %H:%M")
-    except (ValueError, TypeError):
-        return ""
-
-def get_task_category_emoji(category):
-    """Map category to emoji.
-    
-    Categories from Goblin Tools Magic ToDo:
-    ☑️ - General/Default tasks
-    🛠 - Technical/Development tasks
-    📋 - Organization/Planning tasks
-    🎨 - Creative/Design tasks
-    🏢 - Business/Corporate tasks
-    📈 - Analytics/Growth tasks
-    🤝 - Social/Collaboration tasks
-    📚 - Learning/Research tasks
-    🖊 - Writing/Content tasks
-    🎓 - Education/Academic tasks
-    💬 - Communication/Discussion tasks
-    📝 - Documentation/Notes tasks
-    💵 - Financial/Money tasks
+    `write` is called with an open text file. The result replaces
+    `output_file` atomically, so readers never see a partial file, and an
+    identical existing file is left untouched. Returns True if the file was
+    written.
     """
-    emoji_map = {
-        "☑️": "☑️",  # General/Default
-        "🛠": "🛠",   # Technical/Development
-        "📋": "📋",  # Organization/Planning
-        "🎨": "🎨",  # Creative/Design
-        "🏢": "🏢",  # Business/Corporate
-        "📈": "📈",  # Analytics/Growth
-        "🤝": "🤝",  # Social/Collaboration
-        "📚": "📚",  # Learning/Research
-        "🖊": "🖊",   # Writing/Content
-        "🎓": "🎓",  # Education/Academic
-        "💬": "💬",  # Communication/Discussion
-        "📝": "📝",  # Documentation/Notes
-        "💵": "💵"   # Financial/Money
-    }
-    return emoji_map.get(category, "☑️")  # Return default emoji if category not found
-
-def process_tasks(tasks):
-    """Process tasks and return a dictionary of parent-child relationships."""
-    task_dict = {}
-    root_tasks = []
-    
-    # First pass: Create dictionary of all tasks
-    for task in tasks:
-        task_dict[task['id']] = {
-            'task': task,
-            'children': []
-        }
-    
-    # Second pass: Build parent-child relationships
-    for task in tasks:
-        if task['parentId'] is None:
-            root_tasks.append(task_dict[task['id']])
+    directory = os.path.dirname(os.path.abspath(output_file))
+    fd, temp_file = tempfile.mkstemp(dir=directory, prefix='.goblin-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            write(f)
+        if os.path.exists(output_file) and filecmp.cmp(temp_file, output_file, shallow=False):
+            os.remove(temp_file)
+            return False
+        # mkstemp creates owner-only files; keep the usual permissions
+        if os.path.exists(output_file):
+            shutil.copymode(output_file, temp_file)
         else:
-            parent = task_dict.get(task['parentId'])
-            if parent:
-                parent['children'].append(task_dict[task['id']])
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_file, 0o666 & ~umask)
+        os.replace(temp_file, output_file)
+        return True
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+def select_tasks(tasks, filters, stats=NO_STATS, policy='promote', disk=False):
+    """Build a tree from tasks and return a tree of the part matching `filters`.
     
-    return root_tasks
+    `filters` holds TaskIndex.select keyword arguments; without any the
+    whole tree is returned. The selection keeps the full tree's validation
+    report as its diagnostics. With `disk` the tree is a DiskTaskTree, which
+    the caller closes, and `filters` must be empty.
+    """
+    if disk:
+        if filters:
+            raise ValueError("Task selection is not available for trees built on disk")
+        return build_disk_task_tree(tasks, stats, policy)
+    tree = build_task_tree(tasks, stats, policy)
+    if not filters:
+        return tree
+    with stats.stage('query'):
+        selected = build_task_tree(TaskIndex(tree).select(**filters), policy=None)
+    selected.diagnostics = tree.diagnostics
+    stats.count(selected=len(selected))
+    return selected
 
-def generate_markdown(task_node, level=0, show_timestamps=False):
-    """Generate markdown for a task and its children."""
-    task = task_node['task']
-    children = task_node['children']
-    indent = "  " * level
+def read_input(input_file, filters, stats=NO_STATS, multi_parent='first', index=False):
+    """Return (tasks, filters) to convert for one input file.
     
-    # Get emoji if it's a root task
-    emoji = get_task_category_emoji(task.get('category', '')) if level == 0 else ""
+    With `index` and a root_id filter only that task's subtree is decoded,
+    through the file's TaskFileIndex (built or refreshed as needed), and the
+    root filter is dropped from the returned filters as already applied.
+    Otherwise the tasks are parsed incrementally from the whole file.
+    """
+    if index and filters and 'root_id' in filters:
+        with TaskFileIndex(input_file, stats=stats) as file_index:
+            tasks = file_index.select(filters['root_id'])
+        return tasks, {name: value for name, value in filters.items() if name != 'root_id'}
+    return iter_input_tasks(input_file, stats, multi_parent), filters
+
+def convert_file(input_file, show_timestamps=False, targets=('markdown',), stats=NO_STATS,
+                 filters=None, rollups=False, policy='promote', multi_parent='first',
+                 compact=False, split=False, disk=False, index=False, timezone=None,
+                 timestamp_format=None, id_markers=False, notes=None):
+    """Convert one input file to every format in `targets`.
     
-    # Check if task is completed
-    is_completed = task.get('completed', False)
-    checkbox = "[x]" if is_completed else "[ ]"
+    With `filters` only the matching tasks are converted (see select_tasks).
+    With `rollups` headers and parent cards show subtree totals and with
+    `compact` canvases are written without whitespace. With `split` the
+    markdown target is one note per root plus an index note (see
+    write_split_markdown) and `notes`, when given, is a list that receives
+    each note's (note_file, written) tuple. `policy` is passed to validate_task_tree and
+    `multi_parent` to process_canvas_to_tasks. With `disk` the tree is built
+    in a temporary SQLite database instead of memory (see DiskTaskTree) and
+    with `index` a root filter reads only that subtree (see read_input).
+    `timezone`, `timestamp_format` and `id_markers` select the get_formatter
+    used for timestamps and item ids. Returns (outputs, diagnostics): a list
+    of (output_file, written) tuples, where written is False when the
+    existing output already had identical contents, and the validation
+    report.
+    """
+    _, ext = os.path.splitext(input_file)
+    if ext.lower() not in ['.json', '.goblin']:
+        raise ValueError(f"Unsupported file extension {ext}. Please use .json or .goblin files.")
     
-    # Format the task line
-    task_line = f"{indent}- {checkbox} {task['text']}{format_estimate(task.get('estimate'))}"
+    # Tasks are parsed incrementally while the tree is being built; canvas
+    # files are detected from their first character
+    json_data, filters = read_input(input_file, filters, stats, multi_parent, index)
+    tree = select_tasks(json_data, filters, stats, policy, disk)
+    base_name = os.path.splitext(input_file)[0]
+    with contextlib.closing(tree) if disk else contextlib.nullcontext():
+        return write_targets(tree, base_name, targets, stats, show_timestamps, rollups, compact, split,
+                             get_formatter(timezone, timestamp_format, id_markers), notes)
+
+def write_targets(tree, base_name, targets=('markdown',), stats=NO_STATS, show_timestamps=False,
+                  rollups=False, compact=False, split=False, formatter=DEFAULT_FORMATTER, notes=None):
+    """Write a tree to base_name plus each target's extension (see convert_file)."""
+    split_markdown = split and 'markdown' in targets
+    outputs = convert_to_targets(tree, base_name,
+                                 [target for target in targets
+                                  if not (split_markdown and target == 'markdown')],
+                                 {'show_timestamps': show_timestamps, 'rollups': rollups,
+                                  'compact': compact, 'formatter': formatter},
+                                 stats, write_file_atomically)
+    if split_markdown:
+        (index_file, written), written_notes = write_split_markdown(
+            tree, base_name, show_timestamps, rollups, stats, write_file_atomically,
+            formatter=formatter)
+        outputs['markdown'] = (index_file, written or any(note_written
+                                                          for _, note_written in written_notes))
+        if notes is not None:
+            notes.extend(written_notes)
+    return [outputs[target] for target in targets], tree.diagnostics
+
+def convert_merged(input_files, base_name, targets=('markdown',), stats=NO_STATS, rule='newest',
+                   show_timestamps=False, filters=None, rollups=False, policy='promote',
+                   multi_parent='first', compact=False, split=False, disk=False, timezone=None,
+                   timestamp_format=None, id_markers=False):
+    """Merge several input files into one tree and convert it to every format in `targets`.
     
-    # Add timestamp if requested
-    if show_timestamps and task.get('timestamp'):
-        timestamp = format_timestamp(task.get('timestamp'))
-        if timestamp:
-            task_line += f" (Created: {timestamp})"
+    Tasks are joined by id with merge_task_lists under `rule` and the result
+    is written to base_name plus each target's extension; the other options
+    are as for convert_file. Returns (outputs, diagnostics, report) where
+    report is the merge report.
+    """
+    for input_file in input_files:
+        _, ext = os.path.splitext(input_file)
+        if ext.lower() not in ['.json', '.goblin']:
+            raise ValueError(f"Unsupported file extension {ext}. Please use .json or .goblin files.")
+    tasks, report = merge_task_lists((iter_input_tasks(input_file, stats, multi_parent)
+                                      for input_file in input_files), rule, stats)
+    tree = select_tasks(tasks, filters, stats, policy, disk)
+    with contextlib.closing(tree) if disk else contextlib.nullcontext():
+        outputs, diagnostics = write_targets(tree, base_name, targets, stats, show_timestamps,
+                                             rollups, compact, split,
+                                             get_formatter(timezone, timestamp_format, id_markers))
+    return outputs, diagnostics, report
+
+def convert_stream(input_file, output_file, target='markdown', stats=NO_STATS, show_timestamps=False,
+                   filters=None, rollups=False, policy='promote', multi_parent='first',
+                   compact=False, disk=False, index=False, timezone=None, timestamp_format=None,
+                   id_markers=False):
+    """Convert one input to one output format, either of which may be '-'.
     
-    # For root tasks, add a header
-    if level == 0:
-        lines = [f"\n## {emoji} {task['text']}{format_estimate(task.get('estimate'))}"]
+    '-' reads the task list or canvas from standard input or writes the
+    output to standard output; any other output path is written atomically.
+    `index` applies to a file input as in convert_file. Returns (written,
+    diagnostics).
+    """
+    options = {'show_timestamps': show_timestamps, 'rollups': rollups, 'compact': compact,
+               'formatter': get_formatter(timezone, timestamp_format, id_markers)}
+    render = OUTPUT_RENDERERS[target]['render']
+    if input_file == '-':
+        tasks = iter_tasks_from_stream(sys.stdin, stats, multi_parent)
     else:
-        lines = [task_line]
+        tasks, filters = read_input(input_file, filters, stats, multi_parent, index)
+    tree = select_tasks(tasks, filters, stats, policy, disk)
     
-    # Add children
-    for child in children:
-        lines.extend(generate_markdown(child, level + 1, show_timestamps))
+    with contextlib.closing(tree) if disk else contextlib.nullcontext():
+        if output_file == '-':
+            render(tree, sys.stdout, options, stats)
+            sys.stdout.flush()
+            return True, tree.diagnostics
+        return (write_file_atomically(output_file, lambda f: render(tree, f, options, stats)),
+                tree.diagnostics)
+
+def convert_record(job):
+    """Process pool worker: convert one NDJSON line to one encoded output record.
     
-    return lines
+    `job` is (line_number, line, targets, conversion). A line holds a task
+    array, a canvas, or {"id": ..., "tasks": <task array or canvas>}. The
+    record is {"id", "markdown", "canvas", "warning"} for the requested
+    formats (the canvas as an object), or {"id", "error"}. The id defaults
+    to the line number.
+    """
+    line_number, line, targets, conversion = job
+    record_id = line_number
+    separators = (',', ':') if conversion.get('compact') else None
+    try:
+        data = json.loads(line)
+        if isinstance(data, dict) and 'tasks' in data:
+            record_id = data.get('id', line_number)
+            data = data['tasks']
+        if isinstance(data, dict) and 'nodes' in data and 'edges' in data:
+            data = process_canvas_to_tasks(data, conversion.get('multi_parent', 'first'))
+        elif not isinstance(data, list):
+            raise ValueError("Expected a task array, a canvas or an object with 'tasks'")
+        tree = select_tasks(data, conversion.get('filters'), policy=conversion.get('policy', 'promote'))
+        
+        record = {'id': record_id}
+        rollups = conversion.get('rollups', False)
+        formatter = get_formatter(conversion.get('timezone'), conversion.get('timestamp_format'),
+                                  conversion.get('id_markers', False))
+        if 'markdown' in targets:
+            record['markdown'] = convert_json_to_markdown(
+                tree, conversion.get('show_timestamps', False), rollups, formatter)
+        if 'canvas' in targets:
+            record['canvas'] = convert_tasks_to_canvas(tree, rollups=rollups, formatter=formatter)
+        warning = format_diagnostics(tree.diagnostics)
+        if warning:
+            record['warning'] = warning
+    except Exception as e:
+        if isinstance(e, json.JSONDecodeError):
+            e = f"Invalid JSON: {str(e)}"
+        return json.dumps({'id': record_id, 'error': str(e)}, ensure_ascii=False,
+                          separators=separators), True
+    return json.dumps(record, ensure_ascii=False, separators=separators), False
 
-def convert_json_to_markdown(json_data, show_timestamps=False):
-    """Convert JSON task data to markdown format."""
-    # Parse JSON if it's a string
-    if isinstance(json_data, str):
-        tasks = json.loads(json_data)
-    else:
-        tasks = json_data
+def convert_ndjson(lines, output, targets=('markdown',), jobs=1, **conversion):
+    """Convert NDJSON task lists line by line, writing one record per line in order.
+    
+    Each record is written and flushed as soon as it and every earlier one
+    are done, so this can sit in the middle of a long-running pipe. With
+    jobs > 1 lines are converted on a process pool with at most a few lines
+    per worker in flight, which keeps memory bounded. Blank lines are
+    skipped. Returns (records, errors).
+    """
+    work = ((number, line, tuple(targets), conversion)
+            for number, line in enumerate(lines, 1) if line.strip())
+    records = 0
+    errors = 0
+    
+    def emit(result):
+        nonlocal records, errors
+        text, failed = result
+        output.write(text + "\n")
+        output.flush()
+        records += 1
+        errors += failed
     
-    # Process tasks into a tree structure
-    root_tasks = process_tasks(tasks)
+    if jobs == 1:
+        for job in work:
+            emit(convert_record(job))
+        return records, errors
     
-    # Generate markdown
-    markdown_lines = ["# Tasks"]
-    for task_node in root_tasks:
-        markdown_lines.extend(generate_markdown(task_node, show_timestamps=show_timestamps))
+    # A writer thread emits records in order as they finish, even while
+    # reading the next line blocks; the queue bounds the lines in flight
+    jobs = jobs or os.cpu_count() or 1
+    pending = queue.Queue(maxsize=jobs * 4)
+    failures = []
     
-    return "\n".join(markdown_lines)
+    def write_records():
+        while True:
+            future = pending.get()
+            if future is None:
+                return
+            if failures:
+                future.cancel()
+                continue
+            try:
+                emit(future.result())
+            except BaseException as e:
+                failures.append(e)
+    
+    writer = threading.Thread(target=write_records, daemon=True)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        writer.start()
+        try:
+            for job in work:
+                if failures:
+                    break
+                pending.put(executor.submit(convert_record, job))
+        finally:
+            pending.put(None)
+            writer.join()
+    if failures:
+        raise failures[0]
+    return records, errors
 
-def get_output_filename(input_file):
-    """Generate output filename based on input filename."""
-    base_name = os.path.splitext(input_file)[0]
-    return f"{base_name}.md"
-
-def process_canvas_to_tasks(canvas_data):
-    """Convert Obsidian canvas data to task format."""
-    tasks = []
-    node_map = {}
-    
-    # First pass: Create task entries for all nodes
-    for node in canvas_data.get('nodes', []):
-        if node.get('type') == 'text':
-            task = {
-                'id': node['id'],
-                'parentId': None,  # Will be updated in second pass
-                'text': node.get('text', ''),
-                'timestamp': int(datetime.datetime.now().timestamp() * 1000),  # Current timestamp
-                'category': '📝'  # Default category for canvas items
-            }
-            tasks.append(task)
-            node_map[node['id']] = task
-    
-    # Second pass: Process edges to establish parent-child relationships
-    for edge in canvas_data.get('edges', []):
-        from_node = node_map.get(edge['fromNode'])
-        to_node = node_map.get(edge['toNode'])
-        
-        if from_node and to_node:
-            to_node['parentId'] = from_node['id']
-    
-    return tasks
-
-def convert_tasks_to_canvas(tasks):
-    """Convert task data to Obsidian canvas format."""
-    nodes = []
-    edges = []
-    node_map = {}
-    
-    # First pass: Create nodes for all tasks and identify root tasks
-    root_tasks = []
-    for task in tasks:
-        # Format the card text with emoji and time estimate
-        emoji = get_task_category_emoji(task.get('category', ''))
-        time_estimate = format_estimate(task.get('estimate', 0))
-        card_text = f"{emoji} {task['text']}{time_estimate}"
+def iter_input_lines(paths):
+    """Yield the lines of every input file in turn ('-' or nothing is standard input)."""
+    for path in paths or ['-']:
+        if path == '-':
+            yield from sys.stdin
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                yield from f
+
+def describe_error(input_file, error):
+    """Turn a conversion exception into a one-line message."""
+    if isinstance(error, FileNotFoundError):
+        return f"{input_file} not found!"
+    if isinstance(error, json.JSONDecodeError):
+        return f"Invalid JSON format in {input_file}!"
+    return str(error)
+
+def convert_file_safely(job):
+    """Process pool worker: convert one file and report instead of raising.
+    
+    `job` is (input_file, targets, cache_entries, use_cache, profile,
+    conversion) where conversion holds convert_file keyword arguments. When
+    use_cache is set the input is hashed and, if it matches the cache entry
+    of every target and the recorded outputs (including split notes) are
+    still in place, conversion
+    is skipped. Returns (input_file, output_files, error, status,
+    cache_entries, stats, warning) where status is 'converted', 'unchanged',
+    'skipped' or 'failed', stats is a ConversionStats dictionary when
+    profile is set and warning summarizes repairs made to the task tree.
+    """
+    input_file, targets, cache_entries, use_cache, profile, conversion = job
+    stats = ConversionStats() if profile else NO_STATS
+    try:
+        options = {'timestamps': conversion.get('show_timestamps', False), 'version': CACHE_VERSION}
+        options.update((name, value) for name, value in conversion.items()
+                       if name != 'show_timestamps' and value and value != DEFAULT_CONVERSION[name])
+        input_hash = None
+        if use_cache:
+            with stats.stage('hash'):
+                input_hash = hash_file(input_file)
+        output_files = [get_output_path(input_file, target) for target in targets]
         
-        node = {
-            'id': task['id'],
-            'type': 'text',
-            'text': card_text,
-            'width': 400,
-            'height': 100,
-            'color': '1'
-        }
-        nodes.append(node)
-        node_map[task['id']] = node
-        if task['parentId'] is None:
-            root_tasks.append(task)
-    
-    # Calculate layout
-    HORIZONTAL_SPACING = 500  # Space between parent tasks
-    VERTICAL_SPACING = 150    # Space between parent and children
-    CHILD_SPACING = 120      # Space between sibling tasks
-    
-    # Position root tasks horizontally
-    for i, task in enumerate(root_tasks):
-        node = node_map[task['id']]
-        node['x'] = i * HORIZONTAL_SPACING
-        node['y'] = 0
+        if all(is_up_to_date(cache_entries.get(target), input_hash, options, output_file)
+               for target, output_file in zip(targets, output_files)):
+            status = 'skipped'
+            entries = cache_entries
+            warning = None
+        else:
+            notes = []
+            outputs, diagnostics = convert_file(input_file, targets=targets, stats=stats,
+                                                notes=notes, **conversion)
+            warning = format_diagnostics(diagnostics) or None
+            status = 'converted' if any(written for _, written in outputs) else 'unchanged'
+            entries = {}
+            if use_cache:
+                for target, (output_file, _) in zip(targets, outputs):
+                    entries[target] = {'input_hash': input_hash, 'options': options,
+                                       'output_hash': hash_file(output_file)}
+                if notes:
+                    entries['markdown']['notes'] = {note_file: hash_file(note_file)
+                                                    for note_file, _ in notes}
         
-        # Position children vertically below their parent
-        children = [t for t in tasks if t['parentId'] == task['id']]
-        for j, child in enumerate(children):
-            child_node = node_map[child['id']]
-            child_node['x'] = node['x']  # Align with parent
-            child_node['y'] = node['y'] + VERTICAL_SPACING + (j * CHILD_SPACING)
-    
-    # Create edges for parent-child relationships
-    for task in tasks:
-        if task['parentId'] is not None:
-            edge = {
-                'id': f"{task['parentId']}-{task['id']}",
-                'fromNode': task['parentId'],
-                'toNode': task['id'],
-                'label': ''
-            }
-            edges.append(edge)
+        stats.finish()
+        return (input_file, output_files, None, status, entries,
+                stats.to_dict() if profile else None, warning)
+    except Exception as e:
+        stats.finish()
+        return input_file, [], describe_error(input_file, e), 'failed', {}, None, None
+
+def is_up_to_date(cache_entry, input_hash, options, output_file):
+    """Check a cache entry against the current input hash, options and outputs.
+    
+    Entries for split markdown also record the hash of every note, so a
+    missing or edited note is rewritten even when the index is unchanged.
+    """
+    return (cache_entry is not None and cache_entry['input_hash'] == input_hash
+            and cache_entry['options'] == options
+            and all(os.path.exists(path) and hash_file(path) == output_hash
+                    for path, output_hash in [(output_file, cache_entry['output_hash']),
+                                              *cache_entry.get('notes', {}).items()]))
+
+def load_cache(cache_file):
+    """Load the conversion manifest, or an empty one if missing or unreadable."""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == CACHE_VERSION:
+            return manifest['entries']
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    return {}
+
+def save_cache(cache_file, entries):
+    """Write the conversion manifest atomically."""
+    write_file_atomically(cache_file, lambda f: json.dump(
+        {'version': CACHE_VERSION, 'entries': entries}, f, indent=2, sort_keys=True))
+
+def cache_key(input_file, target='markdown'):
+    """Manifest key for a conversion: the absolute path of its output."""
+    return os.path.abspath(get_output_path(input_file, target))
+
+def collect_input_files(paths, file_list=None):
+    """Expand files, directories, glob patterns and a list file into input paths.
+    
+    Directories are searched recursively for .json and .goblin files,
+    ignoring hidden files and directories. Paths are returned in a stable order with duplicates removed.
+    """
+    candidates = list(paths)
+    if file_list:
+        with open(file_list, 'r', encoding='utf-8') as f:
+            candidates.extend(line.strip() for line in f if line.strip())
+    
+    found = []
+    for path in candidates:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                # Skip hidden entries such as .obsidian and the cache manifest
+                dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+                for filename in sorted(filenames):
+                    if filename.startswith('.'):
+                        continue
+                    if os.path.splitext(filename)[1].lower() in ['.json', '.goblin']:
+                        found.append(os.path.join(dirpath, filename))
+        elif glob.has_magic(path):
+            for match in sorted(glob.glob(path, recursive=True)):
+                if os.path.isfile(match) and os.path.splitext(match)[1].lower() in ['.json', '.goblin']:
+                    found.append(match)
+        else:
+            found.append(path)
+    
+    return list(dict.fromkeys(found))
+
+def convert_batch(input_files, show_timestamps=False, targets=('markdown',), jobs=None,
+                  cache=None, force=False, profile=False, filters=None, rollups=False,
+                  policy='promote', multi_parent='first', compact=False, split=False, disk=False,
+                  index=False, timezone=None, timestamp_format=None, id_markers=False):
+    """Convert many files across a process pool and return per-file results.
+    
+    Results are convert_file_safely tuples in input order. With jobs=1
+    everything runs in this process. `cache` is a manifest dictionary from
+    load_cache; it is updated in place with the new entries. With profile
+    set each result carries per-stage stats. `filters` restricts every
+    conversion to the matching tasks, `rollups` adds subtree totals and
+    `policy` and `multi_parent` say how invalid task trees and canvas nodes
+    with several parents are handled, `compact` shrinks canvas output,
+    `split` writes one markdown note per root, `disk` builds each tree in
+    a temporary SQLite database, `index` reads a --root subtree through
+    a sidecar index, `timezone` and `timestamp_format` change how
+    timestamps are written and `id_markers` marks markdown items with
+    their task ids.
+    """
+    use_cache = cache is not None
+    conversion = {'show_timestamps': show_timestamps, 'filters': filters, 'rollups': rollups,
+                  'policy': policy, 'multi_parent': multi_parent, 'compact': compact,
+                  'split': split, 'disk': disk, 'index': index, 'timezone': timezone,
+                  'timestamp_format': timestamp_format, 'id_markers': id_markers}
+    work = []
+    for input_file in input_files:
+        entries = {}
+        if use_cache and not force:
+            for target in targets:
+                entry = cache.get(cache_key(input_file, target))
+                if entry:
+                    entries[target] = entry
+        work.append((input_file, tuple(targets), entries, use_cache, profile, conversion))
+    
+    if jobs == 1 or len(work) <= 1:
+        results = [convert_file_safely(job) for job in work]
+    else:
+        jobs = jobs or os.cpu_count() or 1
+        chunksize = max(1, len(work) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(convert_file_safely, work, chunksize=chunksize))
     
+    if use_cache:
+        for input_file, _, _, _, entries, _, _ in results:
+            for target, entry in entries.items():
+                cache[cache_key(input_file, target)] = entry
+    return results
+
+def print_cache_stats(results):
+    """Print how many conversions the cache skipped or left untouched."""
+    counts = {'skipped': 0, 'converted': 0, 'unchanged': 0, 'failed': 0}
+    for result in results:
+        counts[result[3]] += 1
+    print(f"Cache: {counts['skipped']} skipped, {counts['converted']} written, "
+          f"{counts['unchanged']} unchanged, {counts['failed']} failed.")
+
+def merge_stats(stats_list):
+    """Combine per-file stats dictionaries into one summary."""
+    stages = {}
+    counters = {}
+    for stats in stats_list:
+        for record in stats['stages']:
+            total = stages.setdefault(record['stage'], {'stage': record['stage'], 'seconds': 0.0,
+                                                        'calls': 0, 'peak_bytes': None})
+            total['seconds'] += record['seconds']
+            total['calls'] += record['calls']
+            if record['peak_bytes'] is not None:
+                total['peak_bytes'] = max(total['peak_bytes'] or 0, record['peak_bytes'])
+        for name, value in stats['counters'].items():
+            # Depths are maxima; everything else adds up across files
+            if name == 'max_depth':
+                counters[name] = max(counters.get(name, 0), value)
+            else:
+                counters[name] = counters.get(name, 0) + value
     return {
-        'nodes': nodes,
-        'edges': edges
+        'stages': list(stages.values()),
+        'total_seconds': sum(record['seconds'] for record in stages.values()),
+        'counters': counters
     }
 
-def main():
-    # Get input file from command line argument or use default
-    input_file = sys.argv[1] if len(sys.argv) > 1 else 'tasks.json'
+def report_stats(results, print_table=True, stats_file=None):
+    """Print the stats table to stderr and/or write the stats as JSON."""
+    per_file = [(result[0], result[5]) for result in results if result[5] is not None]
+    summary = merge_stats([stats for _, stats in per_file])
+    
+    if print_table:
+        print(f"\n{format_stats_table(summary)}", file=sys.stderr)
+    if stats_file:
+        report = {
+            'files': [{'input': input_file, **stats} for input_file, stats in per_file],
+            'total': summary
+        }
+        if stats_file == '-':
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            with open(stats_file, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+def print_batch_report(results):
+    """Print per-file results and a summary line, and return the exit code.
+    
+    Exit codes: 0 if every file converted, 2 if some failed, 1 if all failed.
+    """
+    failures = 0
+    for input_file, output_files, error, status, _, _, warning in results:
+        if error:
+            failures += 1
+            print(f"FAILED {input_file}: {error}")
+        elif status == 'skipped':
+            print(f"SKIP   {input_file} (unchanged since last run)")
+        else:
+            print(f"OK     {input_file} -> {', '.join(output_files)}")
+            if warning:
+                print(f"       repaired: {warning}")
+    
+    print(f"\nConverted {len(results) - failures} of {len(results)} files ({failures} failed).")
+    if not failures:
+        return 0
+    return 2 if failures < len(results) else 1
+
+def render_markdown_incremental(tree, state, show_timestamps=False, rollups=False,
+                                formatter=DEFAULT_FORMATTER):
+    """Render the markdown document, re-rendering only root sections that changed.
     
-    # Check if timestamps should be shown
-    show_timestamps = "--timestamps" in sys.argv or "-t" in sys.argv
+    `state` carries the previous run's tasks by id, the root each id lived
+    under, each root's task ids in document order and each root's rendered
+    section; it is updated in place. A root section is reused when none of
+    the tasks under it (before or after the change) were added, removed or
+    edited and its tasks are still in the same order. Returns (document,
+    re_rendered).
+    """
+    tasks_by_id = {tree.tasks[i]['id']: tree.tasks[i] for i in tree.order}
+    old_tasks = state.get('tasks', {})
+    old_root_of = state.get('root_of', {})
+    old_sequences = state.get('sequences', {})
+    old_sections = state.get('sections', {})
+    incremental = (state.get('show_timestamps') == show_timestamps
+                   and state.get('rollups') == rollups
+                   and state.get('formatter') is formatter
+                   and len(tasks_by_id) == len(tree))  # Duplicate ids: render everything
     
-    # Check if we should create a canvas file
-    create_canvas = "--canvas" in sys.argv or "-c" in sys.argv
+    # Map every reachable task to the id of its root, and every root to its
+    # task ids in document order, so reordered siblings are noticed
+    root_of = {}
+    sequences = {}
+    for root in tree.roots:
+        root_id = tree.tasks[root]['id']
+        sequence = []
+        for i, _ in tree.walk([root]):
+            root_of[tree.tasks[i]['id']] = root_id
+            sequence.append(tree.tasks[i]['id'])
+        sequences[root_id] = sequence
     
-    # Check if file exists
-    if not os.path.exists(input_file):
-        print(f"Error: {input_file} not found!")
-        return
+    # A root is dirty if any task under it now, or before, changed
+    dirty = set()
+    if incremental:
+        for task_id, task in tasks_by_id.items():
+            if old_tasks.get(task_id) != task:
+                dirty.add(root_of.get(task_id))
+                dirty.add(old_root_of.get(task_id))
+        for task_id in old_tasks.keys() - tasks_by_id.keys():
+            dirty.add(old_root_of.get(task_id))
+        for root_id, sequence in sequences.items():
+            if old_sequences.get(root_id) != sequence:
+                dirty.add(root_id)
     
-    # Get file extension
-    _, ext = os.path.splitext(input_file)
+    sections = {}
+    re_rendered = 0
+    parts = ["# Tasks"]
+    for root in tree.roots:
+        root_id = tree.tasks[root]['id']
+        section = old_sections.get(root_id) if incremental and root_id not in dirty else None
+        if section is None:
+            section = "\n".join(iter_tree_markdown_lines(tree, show_timestamps, [root], rollups,
+                                                          formatter))
+            re_rendered += 1
+        sections[root_id] = section
+        parts.append(section)
+    
+    state.update(tasks=tasks_by_id, root_of=root_of, sequences=sequences, sections=sections,
+                 show_timestamps=show_timestamps, rollups=rollups, formatter=formatter)
+    return "\n".join(parts), re_rendered
+
+def convert_watched_file(input_file, state, show_timestamps=False, targets=('markdown',),
+                         filters=None, rollups=False, policy='promote', multi_parent='first',
+                         compact=False, split=False, timezone=None, timestamp_format=None,
+                         id_markers=False):
+    """Re-convert one changed file for watch mode and print what happened."""
+    formatter = get_formatter(timezone, timestamp_format, id_markers)
+    tree = select_tasks(iter_input_tasks(input_file, multi_parent=multi_parent), filters,
+                        policy=policy)
+    warning = format_diagnostics(tree.diagnostics)
+    if warning:
+        print(f"Repaired {input_file}: {warning}")
+    for target in targets:
+        output_file = get_output_path(input_file, target)
+        if target == 'markdown' and split:
+            (_, written), notes = write_split_markdown(
+                tree, os.path.splitext(input_file)[0], show_timestamps, rollups,
+                write_file=write_file_atomically, formatter=formatter)
+            updated = sum(note_written for _, note_written in notes)
+            detail = f" ({updated} of {len(notes)} notes updated)"
+            written = written or updated
+        elif target == 'markdown':
+            document, re_rendered = render_markdown_incremental(tree, state, show_timestamps, rollups,
+                                                                formatter)
+            written = write_file_atomically(output_file, lambda f: f.write(document))
+            detail = f" ({re_rendered} of {len(tree.roots)} sections re-rendered)"
+        else:
+            renderer = OUTPUT_RENDERERS[target]['render']
+            written = write_file_atomically(
+                output_file, lambda f: renderer(tree, f, {'show_timestamps': show_timestamps,
+                                                          'rollups': rollups, 'compact': compact,
+                                                          'formatter': formatter}))
+            detail = ""
+        if written:
+            print(f"Updated {output_file}{detail}")
+        else:
+            print(f"{output_file} unchanged{detail}")
+
+def watch(paths, file_list=None, show_timestamps=False, targets=('markdown',),
+          interval=1.0, debounce=0.5, filters=None, rollups=False, policy='promote',
+          multi_parent='first', compact=False, split=False, timezone=None, timestamp_format=None,
+          id_markers=False):
+    """Poll the inputs and re-convert files as they change, until interrupted.
     
+    Files are compared by modification time and size. A change is only
+    converted once the file has stayed the same for `debounce` seconds, so
+    a burst of writes triggers a single conversion.
+    """
+    converted = {}  # Path -> stat signature at the last conversion
+    pending = {}    # Path -> (stat signature, time it was first seen)
+    states = {}     # Path -> incremental markdown state
+    print(f"Watching {', '.join(paths)} for changes (Ctrl+C to stop)")
     try:
-        # Read file content
-        with open(input_file, 'r', encoding='utf-8') as f:
-            if ext.lower() in ['.json', '.goblin']:
-                json_data = json.load(f)
-                # Check if it's a canvas file by looking for nodes and edges
-                if isinstance(json_data, dict) and 'nodes' in json_data and 'edges' in json_data:
-                    json_data = process_canvas_to_tasks(json_data)
-            else:
-                print(f"Error: Unsupported file extension {ext}. Please use .json or .goblin files.")
-                return
-        
-        if create_canvas:
-            # Convert to canvas format
-            canvas_data = convert_tasks_to_canvas(json_data)
-            
-            # Generate output filename
-            base_name = os.path.splitext(input_file)[0]
-            output_file = f"{base_name}.canvas"
-            
-            # Write to file
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(canvas_data, f, indent=2)
+        while True:
+            now = time.monotonic()
+            seen = set()
+            for input_file in collect_input_files(paths, file_list):
+                try:
+                    stat = os.stat(input_file)
+                except OSError:
+                    continue
+                seen.add(input_file)
+                signature = (stat.st_mtime_ns, stat.st_size)
+                if converted.get(input_file) == signature:
+                    pending.pop(input_file, None)
+                    continue
+                if input_file not in pending or pending[input_file][0] != signature:
+                    pending[input_file] = (signature, now)
+                    continue
+                if now - pending[input_file][1] < debounce:
+                    continue
                 
-            print(f"Successfully converted {input_file} to {output_file}!")
-        else:
-            # Convert to markdown
-            markdown = convert_json_to_markdown(json_data, show_timestamps=show_timestamps)
-            
-            # Generate output filename
-            output_file = get_output_filename(input_file)
+                del pending[input_file]
+                converted[input_file] = signature
+                try:
+                    convert_watched_file(input_file, states.setdefault(input_file, {}),
+                                         show_timestamps, targets, filters, rollups, policy,
+                                         multi_parent, compact, split, timezone,
+                                         timestamp_format, id_markers)
+                except Exception as e:
+                    states.pop(input_file, None)
+                    print(f"Error: {describe_error(input_file, e)}")
             
-            # Write to file
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(markdown)
-                
+            # Forget files that were deleted
+            for input_file in list(converted):
+                if input_file not in seen:
+                    converted.pop(input_file)
+                    states.pop(input_file, None)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    return 0
+
+def sync_files(input_files, policy='promote'):
+    """Sync every input from its markdown output and print one line per file.
+    
+    Returns the exit code: 0 if all succeeded, 1 if all failed, 2 if some did.
+    """
+    failures = 0
+    for input_file in input_files:
+        markdown_file = get_output_path(input_file, 'markdown')
+        try:
+            report = sync_markdown_to_tasks(markdown_file, input_file, policy=policy)
+        except Exception as e:
+            failures += 1
+            # A missing markdown file is named, not its input
+            print(f"Error: {describe_error(getattr(e, 'filename', None) or input_file, e)}")
+            continue
+        summary = f"{report['updated']} of {report['items']} tasks updated"
+        if report['unmatched']:
+            summary += f", {report['unmatched']} unmatched"
+        print(f"Synced {markdown_file} into {input_file} ({summary}).")
+    if not failures:
+        return 0
+    return 1 if failures == len(input_files) else 2
+
+def parse_duration(text):
+    """argparse type: a duration like '90', '45m', '1h30m' or '2d' in seconds."""
+    units = {'w': 604800, 'd': 86400, 'h': 3600, 'm': 60, 's': 1}
+    text = text.strip().lower()
+    if text.isdigit():
+        return int(text)
+    total = 0
+    number = ''
+    for char in text:
+        if char.isdigit():
+            number += char
+        elif char in units and number:
+            total += int(number) * units[char]
+            number = ''
+        else:
+            raise argparse.ArgumentTypeError(f"invalid duration: {text!r}")
+    if number:
+        raise argparse.ArgumentTypeError(f"invalid duration: {text!r}")
+    return total
+
+def parse_date(text, end_of_day=False):
+    """argparse type: an ISO date or date-time as Unix seconds in local time.
+    
+    With `end_of_day`, a bare date means the last moment of that day.
+    """
+    try:
+        moment = datetime.datetime.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date: {text!r} (use YYYY-MM-DD[THH:MM])")
+    if end_of_day and len(text) <= 10:
+        moment += datetime.timedelta(days=1, microseconds=-1)
+    return moment.timestamp()
+
+def parse_timezone_name(text):
+    """argparse type: a timezone name accepted by parse_timezone, returned unchanged."""
+    try:
+        parse_timezone(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return text
+
+def get_filters(args):
+    """Collect the task selection options into TaskIndex.select arguments."""
+    filters = {
+        'root_id': args.root,
+        'completed': False if args.open_only else None,
+        'category': args.category,
+        'min_estimate': args.min_estimate,
+        'max_estimate': args.max_estimate,
+        'since': args.since,
+        'until': args.until
+    }
+    return {name: value for name, value in filters.items() if value is not None}
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Convert Goblin Tools task lists to Markdown or Obsidian Canvas.")
+    parser.add_argument('inputs', nargs='*', metavar='INPUT',
+                        help="files, directories or glob patterns to convert (default: tasks.json)")
+    parser.add_argument('-t', '--timestamps', action='store_true',
+                        help="include creation timestamps in the output")
+    parser.add_argument('--timezone', type=parse_timezone_name, metavar='ZONE',
+                        help="write timestamps in ZONE: UTC, an offset like +05:30 or a name "
+                             "like Europe/Berlin (default: local time)")
+    parser.add_argument('--timestamp-format', metavar='FORMAT',
+                        help="strftime format for timestamps (default: "
+                             f"{DEFAULT_TIMESTAMP_FORMAT.replace('%', '%%')})")
+    parser.add_argument('--id-markers', action='store_true',
+                        help="end every Markdown checkbox with its task id in an HTML comment, "
+                             "so --sync can match it even after edits to the text")
+    parser.add_argument('-r', '--rollups', action='store_true',
+                        help="show remaining estimate and progress of each subtree in headers")
+    parser.add_argument('--invalid', choices=TREE_POLICIES, default='promote',
+                        help="how to handle orphans, cycles and self-parented tasks: promote "
+                             "them to roots, break cycles but leave orphans out, or fail "
+                             "(default: promote)")
+    parser.add_argument('--multi-parent', choices=MULTI_PARENT_POLICIES, default='first',
+                        help="for canvas input, how to handle a card linked from several parents: "
+                             "keep the first edge, duplicate it under every parent, or fail "
+                             "(default: first)")
+    parser.add_argument('-c', '--canvas', action='store_true',
+                        help="generate an Obsidian Canvas file instead of Markdown")
+    parser.add_argument('-b', '--both', action='store_true',
+                        help="generate both Markdown and Obsidian Canvas files in one pass")
+    parser.add_argument('--compact', action='store_true',
+                        help="write canvas files without indentation (smaller, same content)")
+    parser.add_argument('-s', '--split', action='store_true',
+                        help="write one Markdown note per root task in a folder, plus an index note")
+    parser.add_argument('--disk', action='store_true',
+                        help="build the task tree in a temporary SQLite database instead of "
+                             "memory, for exports larger than RAM (slower, same output)")
+    parser.add_argument('--sync', action='store_true',
+                        help="instead of converting, copy the checkbox states of each input's "
+                             "Markdown file (INPUT.md) back into the input's completed fields")
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help="write the output to FILE instead of next to the input "
+                             "('-' for standard output; the default when the input is '-')")
+    parser.add_argument('--ndjson', action='store_true',
+                        help="read one task list or canvas per line (standard input by default) "
+                             "and write one JSON record per line to standard output")
+    parser.add_argument('-m', '--merge', metavar='NAME',
+                        help="merge every input into one task list, matching tasks by id, and "
+                             "write it to NAME.md (or NAME.canvas)")
+    parser.add_argument('--merge-rule', choices=MERGE_RULES, default='newest',
+                        help="which copy of a task wins when merged inputs disagree: the newest, "
+                             "or the newest but completed if any copy is (default: newest)")
+    parser.add_argument('-f', '--file-list', metavar='FILE',
+                        help="read additional input paths from FILE, one per line")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="number of worker processes for batch conversion (default: CPU count)")
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_FILE, metavar='FILE',
+                        help="skip inputs unchanged since the last run, tracked in FILE "
+                             f"(default: {DEFAULT_CACHE_FILE})")
+    parser.add_argument('--force', action='store_true',
+                        help="reconvert every input even if the cache says it is up to date")
+    parser.add_argument('--profile', action='store_true',
+                        help="print per-stage timings, counts and peak memory to stderr")
+    parser.add_argument('--stats', metavar='FILE',
+                        help="write per-stage statistics as JSON to FILE ('-' for stdout)")
+    parser.add_argument('-w', '--watch', action='store_true',
+                        help="keep running and re-convert inputs whenever they change")
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help="seconds between checks for changes in watch mode (default: 1)")
+    parser.add_argument('--debounce', type=float, default=0.5,
+                        help="seconds a file must stay unchanged before it is converted (default: 0.5)")
+    
+    query = parser.add_argument_group("task selection")
+    query.add_argument('--root', metavar='ID',
+                       help="convert only the task with this id and its subtasks")
+    query.add_argument('--index', action='store_true',
+                       help="with --root, memory-map the input and decode only that subtree, "
+                            "using a sidecar index saved as INPUT.index (rebuilt when INPUT changes)")
+    query.add_argument('--open-only', action='store_true',
+                       help="convert only tasks that are not completed (and their parents)")
+    query.add_argument('--category', metavar='EMOJI',
+                       help="convert only tasks with this category emoji, e.g. 🛠")
+    query.add_argument('--min-estimate', type=parse_duration, metavar='DURATION',
+                       help="convert only tasks estimated at least DURATION, e.g. 30m or 1h30m")
+    query.add_argument('--max-estimate', type=parse_duration, metavar='DURATION',
+                       help="convert only tasks estimated at most DURATION")
+    query.add_argument('--since', type=parse_date, metavar='DATE',
+                       help="convert only tasks created on or after DATE (YYYY-MM-DD)")
+    query.add_argument('--until', type=lambda text: parse_date(text, end_of_day=True), metavar='DATE',
+                       help="convert only tasks created on or before DATE (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+    
+    streaming = args.ndjson or args.inputs == ['-'] or args.output
+    if streaming and (args.watch or args.split or args.cache or args.file_list):
+        parser.error("--watch, --split, --cache and --file-list cannot be combined with "
+                     "--ndjson, --output or '-'")
+    if args.disk and (args.watch or args.split or args.ndjson or get_filters(args)):
+        parser.error("--disk cannot be combined with --watch, --split, --ndjson or task selection")
+    if args.index and (not args.root or args.ndjson or args.watch or args.merge or '-' in args.inputs):
+        parser.error("--index needs --root and cannot be combined with --ndjson, --watch, "
+                     "--merge or '-'")
+    if args.sync and (streaming or args.watch or args.merge or args.split or args.cache):
+        parser.error("--sync cannot be combined with --ndjson, --output, '-', --watch, --merge, "
+                     "--split or --cache")
+    if args.merge and (streaming or args.watch or args.cache):
+        parser.error("--merge cannot be combined with --ndjson, --output, '-', --watch or --cache")
+    if (args.inputs == ['-'] or args.output) and not args.ndjson:
+        if args.both:
+            parser.error("--both writes two files and cannot be combined with --output or '-'")
+        if len(args.inputs) > 1:
+            parser.error("--output takes a single input")
+    to_stdout = args.ndjson or args.output == '-' or (args.inputs == ['-'] and not args.output)
+    if args.stats == '-' and to_stdout:
+        parser.error("--stats - would mix statistics into the converted output")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    cache = load_cache(args.cache) if args.cache else None
+    profile = args.profile or bool(args.stats)
+    conversion = {
+        'show_timestamps': args.timestamps,
+        'filters': get_filters(args),
+        'rollups': args.rollups,
+        'policy': args.invalid,
+        'multi_parent': args.multi_parent,
+        'compact': args.compact,
+        'timezone': args.timezone,
+        'timestamp_format': args.timestamp_format,
+        'id_markers': args.id_markers
+    }
+    
+    # Output formats are rendered from one shared tree per input
+    if args.both:
+        targets = ('markdown', 'canvas')
+    elif args.canvas:
+        targets = ('canvas',)
+    else:
+        targets = ('markdown',)
+    
+    # Standard input and output always carry UTF-8 JSON and Markdown
+    for stream in (sys.stdin, sys.stdout):
+        if hasattr(stream, 'reconfigure'):
+            stream.reconfigure(encoding='utf-8')
+    
+    if args.ndjson:
+        try:
+            records, errors = convert_ndjson(iter_input_lines(args.inputs), sys.stdout, targets,
+                                             args.jobs, **conversion)
+        except OSError as e:
+            print(f"Error: {str(e)}", file=sys.stderr)
+            return 1
+        print(f"Converted {records - errors} of {records} records ({errors} failed).", file=sys.stderr)
+        if not errors:
+            return 0
+        return 2 if errors < records else 1
+    
+    if args.watch:
+        return watch(args.inputs or ['.'], args.file_list, targets=targets,
+                     interval=args.interval, debounce=args.debounce, split=args.split,
+                     **conversion)
+    
+    if args.inputs == ['-'] or args.output:
+        # One input to one output, either of which may be a stream
+        input_file = args.inputs[0] if args.inputs else 'tasks.json'
+        output_file = args.output or '-'
+        stats = ConversionStats() if profile else NO_STATS
+        log = sys.stderr if output_file == '-' else sys.stdout
+        try:
+            written, diagnostics = convert_stream(input_file, output_file, targets[0], stats,
+                                                  disk=args.disk, index=args.index, **conversion)
+        except Exception as e:
+            print(f"Error: {describe_error(input_file, e)}", file=log)
+            return 1
+        finally:
+            stats.finish()
+        warning = format_diagnostics(diagnostics)
+        if warning:
+            print(f"Warning: repaired invalid task tree: {warning}", file=log)
+        if output_file != '-':
+            print(f"Successfully converted {input_file} to {output_file}!" if written
+                  else f"{output_file} is unchanged.")
+        if profile:
+            report_stats([(input_file, [output_file], None, 'converted', {}, stats.to_dict(), warning)],
+                         args.profile, args.stats)
+        return 0
+    
+    if args.merge:
+        try:
+            input_files = collect_input_files(args.inputs or ['tasks.json'], args.file_list)
+        except OSError as e:
+            print(f"Error: {str(e)}")
+            return 1
+        if not input_files:
+            print("Error: No .json or .goblin files found!")
+            return 1
+        missing = [input_file for input_file in input_files if not os.path.exists(input_file)]
+        if missing:
+            print(f"Error: {missing[0]} not found!")
+            return 1
+        stats = ConversionStats() if profile else NO_STATS
+        try:
+            outputs, diagnostics, report = convert_merged(input_files, args.merge, targets, stats,
+                                                          args.merge_rule, split=args.split,
+                                                          disk=args.disk, **conversion)
+        except Exception as e:
+            print(f"Error: {describe_error('the merged inputs', e)}")
+            return 1
+        finally:
+            stats.finish()
+        output_files = [output_file for output_file, _ in outputs]
+        print(f"Successfully {format_merge_report(report)} and wrote {' and '.join(output_files)}!")
+        warning = format_diagnostics(diagnostics)
+        if warning:
+            print(f"Warning: repaired invalid task tree: {warning}")
+        if profile:
+            report_stats([(args.merge, output_files, None, 'converted', {}, stats.to_dict(), warning)],
+                         args.profile, args.stats)
+        return 0
+    
+    if args.sync:
+        try:
+            input_files = collect_input_files(args.inputs or ['tasks.json'], args.file_list)
+        except OSError as e:
+            print(f"Error: {str(e)}")
+            return 1
+        if not input_files:
+            print("Error: No .json or .goblin files found!")
+            return 1
+        return sync_files(input_files, args.invalid)
+    
+    # A single file argument keeps the original one-shot behaviour
+    single = (not args.file_list and len(args.inputs) <= 1
+              and not any(os.path.isdir(p) or glob.has_magic(p) for p in args.inputs))
+    
+    if single:
+        # Get input file from command line argument or use default
+        input_file = args.inputs[0] if args.inputs else 'tasks.json'
+        
+        # Check if file exists
+        if not os.path.exists(input_file):
+            print(f"Error: {input_file} not found!")
+            return 1
+        
+        results = convert_batch([input_file], targets=targets, jobs=1, cache=cache,
+                                force=args.force, profile=profile, split=args.split,
+                                disk=args.disk, index=args.index, **conversion)
+        _, output_files, error, status, _, _, warning = results[0]
+        output_file = " and ".join(output_files)
+        if error:
+            print(f"Error: {error}")
+        elif status == 'skipped':
+            print(f"{output_file} {'are' if len(output_files) > 1 else 'is'} up to date.")
+        else:
             print(f"Successfully converted {input_file} to {output_file}!")
+        if warning:
+            print(f"Warning: repaired invalid task tree: {warning}")
+        exit_code = 1 if error else 0
+    else:
+        try:
+            input_files = collect_input_files(args.inputs, args.file_list)
+        except OSError as e:
+            print(f"Error: {str(e)}")
+            return 1
+        if not input_files:
+            print("Error: No .json or .goblin files found!")
+            return 1
         
-    except json.JSONDecodeError:
-        print(f"Error: Invalid JSON format in {input_file}!")
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
+        results = convert_batch(input_files, targets=targets, jobs=args.jobs, cache=cache,
+                                force=args.force, profile=profile, split=args.split,
+                                disk=args.disk, index=args.index, **conversion)
+        exit_code = print_batch_report(results)
+    
+    if cache is not None:
+        print_cache_stats(results)
+        save_cache(args.cache, cache)
+    if profile:
+        report_stats(results, args.profile, args.stats)
+    return exit_code
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main()) 
\ No newline at end of file
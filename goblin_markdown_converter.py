@@ -3,10 +3,22 @@ Goblin Markdown Converter Core v1.0
 Core library for converting Goblin Tools task lists to Markdown.
 """
 
+import bisect
+import contextlib
 import json
 import datetime
+import functools
+import mmap
 import sys
 import os
+import re
+import sqlite3
+import time
+import tracemalloc
+import zoneinfo
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote
 
 def format_duration(seconds):
     """Convert seconds to a human-readable duration string."""
@@ -34,25 +46,11 @@ def format_duration(seconds):
 
 def format_estimate(estimate):
     """Format the time estimate to a string."""
-    if not estimate:
-        return ""
-    duration = format_duration(estimate)
-    return f" ({duration})" if duration else ""
+    return DEFAULT_FORMATTER.estimate(estimate)
 
 def format_timestamp(timestamp):
     """Format timestamp to a readable date."""
-    if not timestamp:
-        return ""
-    
-    # Convert milliseconds to seconds if needed
-    if timestamp > 1000000000000:  # If timestamp is in milliseconds
-        timestamp = timestamp / 1000
-    
-    try:
-        dt = datetime.datetime.fromtimestamp(timestamp)
-        return dt.strftime("%Y-%m-%d %H:%M")
-    except (ValueError, TypeError):
-        return ""
+    return DEFAULT_FORMATTER.timestamp(timestamp)
 
 def get_task_category_emoji(category):
     """Map category to emoji.
@@ -72,192 +70,2463 @@ def get_task_category_emoji(category):
     📝 - Documentation/Notes tasks
     💵 - Financial/Money tasks
     """
-    emoji_map = {
-        "☑️": "☑️",  # General/Default
-        "🛠": "🛠",   # Technical/Development
-        "📋": "📋",  # Organization/Planning
-        "🎨": "🎨",  # Creative/Design
-        "🏢": "🏢",  # Business/Corporate
-        "📈": "📈",  # Analytics/Growth
-        "🤝": "🤝",  # Social/Collaboration
-        "📚": "📚",  # Learning/Research
-        "🖊": "🖊",   # Writing/Content
-        "🎓": "🎓",  # Education/Academic
-        "💬": "💬",  # Communication/Discussion
-        "📝": "📝",  # Documentation/Notes
-        "💵": "💵"   # Financial/Money
+    return TASK_CATEGORY_EMOJI.get(category, "☑️")  # Return default emoji if category not found
+
+# Built once: this lookup runs for every task
+TASK_CATEGORY_EMOJI = {
+    "☑️": "☑️",  # General/Default
+    "🛠": "🛠",   # Technical/Development
+    "📋": "📋",  # Organization/Planning
+    "🎨": "🎨",  # Creative/Design
+    "🏢": "🏢",  # Business/Corporate
+    "📈": "📈",  # Analytics/Growth
+    "🤝": "🤝",  # Social/Collaboration
+    "📚": "📚",  # Learning/Research
+    "🖊": "🖊",   # Writing/Content
+    "🎓": "🎓",  # Education/Academic
+    "💬": "💬",  # Communication/Discussion
+    "📝": "📝",  # Documentation/Notes
+    "💵": "💵"   # Financial/Money
+}
+
+DEFAULT_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
+
+# strftime directives that show seconds or finer; other formats are cached per minute
+_SUB_MINUTE_DIRECTIVE = re.compile(r'%[-#]?[STXcfrs+]')
+
+class TaskFormatter:
+    """Cached formatting of estimates, durations and timestamps for the renderers.
+    
+    Exports repeat a handful of estimates and, at minute resolution, of
+    creation times across thousands of tasks, so each distinct value is
+    formatted once and later calls are answered from bounded LRU caches;
+    cache_info() reports their hits and misses. `timezone` is a tzinfo, or
+    None for local time, and `timestamp_format` a strftime format. With
+    `id_markers` markdown items end with an id marker (see marker). Get
+    instances from get_formatter, so the markdown and canvas renderers of
+    one configuration share their caches.
+    """
+    
+    def __init__(self, timezone=None, timestamp_format=DEFAULT_TIMESTAMP_FORMAT, id_markers=False,
+                 cache_size=4096):
+        self.timezone = timezone
+        self.timestamp_format = timestamp_format
+        self.id_markers = id_markers
+        # Formats that show seconds cannot share one string per minute
+        self.per_minute = not _SUB_MINUTE_DIRECTIVE.search(timestamp_format)
+        # Typed, because 600 and 600.0 are formatted differently
+        cache = functools.lru_cache(maxsize=cache_size, typed=True)
+        self._duration = cache(format_duration)
+        self._estimate = cache(self._format_estimate)
+        self._time = cache(self._format_time)
+    
+    def _format_estimate(self, estimate):
+        duration = self._duration(estimate)
+        return f" ({duration})" if duration else ""
+    
+    def _format_time(self, seconds):
+        return datetime.datetime.fromtimestamp(seconds, self.timezone).strftime(self.timestamp_format)
+    
+    def duration(self, seconds):
+        """Return format_duration(seconds), cached."""
+        return self._duration(seconds)
+    
+    def estimate(self, estimate):
+        """Format a time estimate as " (1h 30m)", or "" without one."""
+        if not estimate:
+            return ""
+        return self._estimate(estimate)
+    
+    def timestamp(self, timestamp):
+        """Format a creation timestamp in seconds or milliseconds ("" if missing or invalid)."""
+        if not timestamp:
+            return ""
+        
+        # Convert milliseconds to seconds if needed
+        if timestamp > 1000000000000:  # If timestamp is in milliseconds
+            timestamp = timestamp / 1000
+        
+        try:
+            if self.per_minute:
+                return self._time(int(timestamp // 60) * 60)
+            return self._time(timestamp)
+        except (ValueError, TypeError):
+            return ""
+    
+    def marker(self, task):
+        """Return a markdown item's id marker, " <!-- id:t4 -->", or "" without id_markers.
+        
+        sync_markdown_to_tasks uses it to find the task of a ticked item.
+        """
+        if not self.id_markers:
+            return ""
+        return f" <!-- id:{quote(str(task['id']), safe='')} -->"
+    
+    def cache_info(self):
+        """Return {cache name: {'hits', 'misses', 'maxsize', 'currsize'}}."""
+        return {name: cache.cache_info()._asdict()
+                for name, cache in (('duration', self._duration), ('estimate', self._estimate),
+                                    ('timestamp', self._time))}
+    
+    def counts(self):
+        """Return the (hits, misses) of all caches together."""
+        infos = [cache.cache_info() for cache in (self._duration, self._estimate, self._time)]
+        return sum(info.hits for info in infos), sum(info.misses for info in infos)
+    
+    @contextlib.contextmanager
+    def counting(self, stats):
+        """Add the cache hits and misses of the block to `stats` counters."""
+        if not stats.enabled:
+            yield
+            return
+        hits, misses = self.counts()
+        try:
+            yield
+        finally:
+            new_hits, new_misses = self.counts()
+            stats.add(format_cache_hits=new_hits - hits, format_cache_misses=new_misses - misses)
+
+def parse_timezone(name):
+    """Return the tzinfo for 'UTC', an offset like '+05:30' or an IANA name; None is local time."""
+    if name is None:
+        return None
+    if name.upper() in ('UTC', 'Z'):
+        return datetime.timezone.utc
+    offset = re.fullmatch(r'([+-])(\d{1,2}):?(\d{2})?', name)
+    if offset:
+        sign, hours, minutes = offset.groups()
+        delta = datetime.timedelta(hours=int(hours), minutes=int(minutes or 0))
+        return datetime.timezone(-delta if sign == '-' else delta)
+    try:
+        return zoneinfo.ZoneInfo(name)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone {name!r}") from None
+
+_FORMATTERS = {}
+
+def get_formatter(timezone=None, timestamp_format=None, id_markers=False):
+    """Return the shared TaskFormatter for a timezone name, strftime format and id markers.
+    
+    None means local time and DEFAULT_TIMESTAMP_FORMAT. Every conversion
+    with the same settings in a process reuses the same caches.
+    """
+    key = (timezone, timestamp_format or DEFAULT_TIMESTAMP_FORMAT, bool(id_markers))
+    formatter = _FORMATTERS.get(key)
+    if formatter is None:
+        formatter = _FORMATTERS[key] = TaskFormatter(parse_timezone(timezone), key[1], key[2])
+    return formatter
+
+DEFAULT_FORMATTER = get_formatter()
+
+class ConversionStats:
+    """Opt-in per-stage wall time, peak memory and counters for a conversion.
+    
+    Wrap pipeline stages in `with stats.stage(name):` and attach counts with
+    stats.count(). Time spent in a nested stage is excluded from the stage
+    around it, so parsing that happens while the tree is being built is
+    reported separately. Peak memory comes from tracemalloc. NO_STATS is a
+    disabled instance whose hooks do nothing, which is the default everywhere.
+    """
+    
+    def __init__(self, enabled=True, trace_memory=True):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.stages = {}
+        self.counters = {}
+        self._active = []  # [name, start, peak, nested seconds] per open stage
+        self._started_tracing = False
+    
+    def stage(self, name):
+        """Return a context manager that measures one pipeline stage."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._measure(name)
+    
+    @contextlib.contextmanager
+    def _measure(self, name):
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            if self._active:
+                parent = self._active[-1]
+                parent[2] = max(parent[2], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        
+        frame = [name, time.perf_counter(), 0, 0.0]
+        self._active.append(frame)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - frame[1]
+            self._active.pop()
+            peak = max(frame[2], tracemalloc.get_traced_memory()[1]) if self.trace_memory else None
+            
+            record = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'peak_bytes': None})
+            record['seconds'] += elapsed - frame[3]
+            record['calls'] += 1
+            if peak is not None:
+                record['peak_bytes'] = max(record['peak_bytes'] or 0, peak)
+            
+            if self._active:
+                parent = self._active[-1]
+                parent[3] += elapsed
+                if peak is not None:
+                    parent[2] = max(parent[2], peak)
+    
+    def timed(self, name, iterable):
+        """Wrap an iterable so the time spent producing items counts as a stage."""
+        if not self.enabled:
+            return iterable
+        return self._timed(name, iter(iterable))
+    
+    def _timed(self, name, iterator):
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    
+    def timed_writer(self, name, output):
+        """Wrap a file so the time spent in write() counts as a stage."""
+        if not self.enabled:
+            return output
+        return _TimedWriter(self, name, output)
+    
+    def count(self, **counters):
+        """Record counters such as tasks, nodes, edges or max_depth."""
+        if self.enabled:
+            self.counters.update(counters)
+    
+    def add(self, **counters):
+        """Add to counters that several stages contribute to, such as cache hits."""
+        if self.enabled:
+            for name, value in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+    
+    def finish(self):
+        """Stop tracemalloc if these stats started it."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+    
+    def to_dict(self):
+        """Return the stats as a JSON-serializable dictionary."""
+        return {
+            'stages': [{'stage': name, **record} for name, record in self.stages.items()],
+            'total_seconds': sum(record['seconds'] for record in self.stages.values()),
+            'counters': dict(self.counters)
+        }
+
+class _TimedWriter:
+    """File wrapper that measures write() calls as a stage."""
+    
+    def __init__(self, stats, name, output):
+        self._stats = stats
+        self._name = name
+        self._output = output
+    
+    def write(self, text):
+        with self._stats.stage(self._name):
+            return self._output.write(text)
+
+_NULL_STAGE = contextlib.nullcontext()
+NO_STATS = ConversionStats(enabled=False)
+
+def format_stats_table(stats):
+    """Format a stats dictionary (from ConversionStats.to_dict) as a text table."""
+    lines = [f"{'Stage':<18} {'Calls':>7} {'Time (ms)':>11} {'Peak (MiB)':>11}"]
+    for record in stats['stages']:
+        peak = record['peak_bytes']
+        peak_text = f"{peak / (1024 * 1024):.2f}" if peak is not None else "-"
+        lines.append(f"{record['stage']:<18} {record['calls']:>7} "
+                     f"{record['seconds'] * 1000:>11.2f} {peak_text:>11}")
+    lines.append(f"{'total':<18} {'':>7} {stats['total_seconds'] * 1000:>11.2f}")
+    for name, value in stats['counters'].items():
+        lines.append(f"{name}: {value}")
+    return "\n".join(lines)
+
+class TaskTree:
+    """Compact task tree stored as parallel arrays indexed by task position.
+    
+    Every task (and every parent id referenced before its task is seen) gets
+    an integer index. Links are kept in `array` columns: `parent`,
+    `first_child`, `last_child` and `next_sibling`, with -1 meaning none.
+    `tasks` holds the original task dicts (None for a parent that never
+    appeared), `categories` the resolved category emoji (shared strings),
+    `roots` the root indices in input order and `order` the index of every
+    task in input order. Build one with build_task_tree and share it between
+    the markdown and canvas renderers.
+    
+    Tasks under a missing parent, in a cycle or parented to themselves are
+    not reachable from any root until validate_task_tree repairs the tree.
+    """
+    __slots__ = ('tasks', 'categories', 'index', 'parent', 'first_child',
+                 'last_child', 'next_sibling', 'roots', 'order', 'diagnostics',
+                 '_preorder', '_rollups')
+    
+    def __init__(self):
+        self.tasks = []
+        self.categories = []
+        self.index = {}
+        self.parent = array('l')
+        self.first_child = array('l')
+        self.last_child = array('l')
+        self.next_sibling = array('l')
+        self.roots = array('l')
+        self.order = array('l')
+        self.diagnostics = None  # Set by validate_task_tree
+        self._preorder = None
+        self._rollups = None
+    
+    def __len__(self):
+        return len(self.order)
+    
+    def _new_slot(self):
+        """Append an empty record and return its index."""
+        self.tasks.append(None)
+        self.categories.append(None)
+        for column in (self.parent, self.first_child, self.last_child, self.next_sibling):
+            column.append(-1)
+        return len(self.tasks) - 1
+    
+    def add(self, task):
+        """Add a task, linking it under its parent, and return its index.
+        
+        A task whose id was already added gets a record of its own; later
+        children with that id as parent attach to the first one.
+        """
+        task_id = task['id']
+        i = self.index.get(task_id)
+        if i is None:
+            i = self.index[task_id] = self._new_slot()
+        elif self.tasks[i] is not None:  # Duplicate id
+            i = self._new_slot()
+        self._preorder = None
+        self._rollups = None
+        self.tasks[i] = task
+        self.categories[i] = get_task_category_emoji(task.get('category', ''))
+        self.order.append(i)
+        
+        parent_id = task['parentId']
+        if parent_id is None:
+            self.roots.append(i)
+            return i
+        
+        p = self.index.get(parent_id)
+        if p is None:
+            p = self.index[parent_id] = self._new_slot()
+        self.parent[i] = p
+        if self.last_child[p] == -1:
+            self.first_child[p] = i
+        else:
+            self.next_sibling[self.last_child[p]] = i
+        self.last_child[p] = i
+        return i
+    
+    def children(self, i):
+        """Yield the child indices of a task in input order."""
+        child = self.first_child[i]
+        while child != -1:
+            yield child
+            child = self.next_sibling[child]
+    
+    def walk(self, roots=None, include=None):
+        """Iterate (index, depth) for every task reachable from the roots, pre-order.
+        
+        With `include`, a set of indices, only those tasks are visited and
+        branches outside it are skipped. Walking the whole tree reuses the
+        list cached by preorder(), if any.
+        """
+        roots = self.roots if roots is None else roots
+        if include is not None:
+            return self._walk_included(roots, include)
+        if roots is self.roots and self._preorder is not None:
+            return iter(self._preorder)
+        return self._walk(roots)
+    
+    def preorder(self):
+        """Return the full pre-order walk as a list, computed once and cached.
+        
+        Renderers that run over the same tree share this single traversal.
+        """
+        if self._preorder is None:
+            self._preorder = list(self._walk(self.roots))
+        return self._preorder
+    
+    def detach(self, i):
+        """Unlink a task from its parent's children and make it a root.
+        
+        The caller adds it to `roots` where it belongs in input order.
+        """
+        p = self.parent[i]
+        if p == -1:
+            return
+        previous = -1
+        child = self.first_child[p]
+        while child != i:
+            previous = child
+            child = self.next_sibling[child]
+        if previous == -1:
+            self.first_child[p] = self.next_sibling[i]
+        else:
+            self.next_sibling[previous] = self.next_sibling[i]
+        if self.last_child[p] == i:
+            self.last_child[p] = previous
+        self.parent[i] = -1
+        self.next_sibling[i] = -1
+        self._preorder = None
+        self._rollups = None
+    
+    def rollups(self):
+        """Return the SubtreeTotals of every task, computed once and cached."""
+        if self._rollups is None:
+            self._rollups = SubtreeTotals(self)
+        return self._rollups
+    
+    def _walk(self, roots):
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        for root in roots:
+            stack = [(root, 0)]
+            while stack:
+                i, depth = stack.pop()
+                yield i, depth
+                if depth and next_sibling[i] != -1:
+                    stack.append((next_sibling[i], depth))
+                if first_child[i] != -1:
+                    stack.append((first_child[i], depth + 1))
+    
+    def _walk_included(self, roots, include):
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        
+        def next_included(i):
+            while i != -1 and i not in include:
+                i = next_sibling[i]
+            return i
+        
+        for root in roots:
+            if root not in include:
+                continue
+            stack = [(root, 0)]
+            while stack:
+                i, depth = stack.pop()
+                yield i, depth
+                if depth:
+                    sibling = next_included(next_sibling[i])
+                    if sibling != -1:
+                        stack.append((sibling, depth))
+                child = next_included(first_child[i])
+                if child != -1:
+                    stack.append((child, depth + 1))
+    
+    def to_nodes(self):
+        """Return the root nodes in process_tasks' {'task', 'children'} shape."""
+        nodes = [{'task': task, 'children': []} for task in self.tasks]
+        for i, node in enumerate(nodes):
+            node['children'] = [nodes[child] for child in self.children(i)]
+        return [nodes[root] for root in self.roots]
+
+class SubtreeTotals:
+    """Per-subtree estimate and progress totals for a TaskTree.
+    
+    Columns are indexed like the tree and cover each task plus everything
+    below it: `estimate` (all estimates), `remaining` (estimates of tasks not
+    completed), `done` (completed tasks) and `count` (tasks). They are filled
+    in one pass over the pre-order walk in reverse, so every child is added
+    to its parent before the parent is added to its own.
+    """
+    __slots__ = ('estimate', 'remaining', 'done', 'count')
+    
+    def __init__(self, tree):
+        size = len(tree.tasks)
+        self.estimate = array('d', [0.0]) * size
+        self.remaining = array('d', [0.0]) * size
+        self.done = array('l', [0]) * size
+        self.count = array('l', [0]) * size
+        
+        tasks = tree.tasks
+        parent = tree.parent
+        for i, _ in reversed(tree.preorder()):
+            task = tasks[i]
+            estimate = task.get('estimate') or 0
+            self.estimate[i] += estimate
+            self.count[i] += 1
+            if task.get('completed', False):
+                self.done[i] += 1
+            else:
+                self.remaining[i] += estimate
+            
+            p = parent[i]
+            if p != -1:
+                self.estimate[p] += self.estimate[i]
+                self.remaining[p] += self.remaining[i]
+                self.done[p] += self.done[i]
+                self.count[p] += self.count[i]
+    
+    def format(self, i, formatter=DEFAULT_FORMATTER):
+        """Format a task's totals as " (3d 4h, 12/40 done)" (remaining work first)."""
+        return format_subtree_totals(self.remaining[i], self.done[i], self.count[i], formatter)
+
+def format_subtree_totals(remaining, done, count, formatter=DEFAULT_FORMATTER):
+    """Format subtree totals as " (3d 4h, 12/40 done)" (remaining work first)."""
+    remaining = formatter.duration(int(remaining))
+    progress = f"{done}/{count} done"
+    return f" ({remaining}, {progress})" if remaining else f" ({progress})"
+
+# How validate_task_tree handles tasks that are not reachable from a root
+TREE_POLICIES = ('promote', 'break', 'fail')
+
+class TaskTreeError(ValueError):
+    """Raised by validate_task_tree under the 'fail' policy."""
+    
+    def __init__(self, message, diagnostics):
+        super().__init__(message)
+        self.diagnostics = diagnostics
+
+def validate_task_tree(tree, policy='promote'):
+    """Find and repair duplicate ids, self-parents, orphans and cycles in a TaskTree.
+    
+    Every task that is not reachable from a root has its parent chain
+    followed once, so the whole check is linear. With the 'promote' policy
+    tasks whose parent is missing, tasks that are their own parent and the
+    first task (in input order) of every cycle become roots, so nothing is
+    lost. 'break' repairs self-parents and cycles but leaves orphans out of
+    the output, and 'fail' raises TaskTreeError if anything is wrong.
+    Duplicate ids are always kept and only reported.
+    
+    Returns a diagnostics dictionary, also stored as tree.diagnostics.
+    """
+    if policy not in TREE_POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}, expected one of {', '.join(TREE_POLICIES)}")
+    tasks = tree.tasks
+    parent = tree.parent
+    
+    reachable = bytearray(len(tasks))
+    for i, _ in tree.preorder():
+        reachable[i] = 1
+    
+    duplicates = [tasks[i]['id'] for i in tree.order if tree.index[tasks[i]['id']] != i]
+    self_parents = []
+    orphans = []
+    cycles = []
+    
+    # 0: not seen, 1: on the chain being followed, 2: already classified
+    state = bytearray(len(tasks))
+    for i in tree.order:
+        if reachable[i] or state[i]:
+            continue
+        chain = []
+        j = i
+        while j != -1 and not reachable[j] and not state[j] and tasks[j] is not None:
+            state[j] = 1
+            chain.append(j)
+            j = parent[j]
+        if j != -1 and tasks[j] is None:
+            orphans.append(chain[-1])
+        elif j != -1 and state[j] == 1:
+            cycle = chain[chain.index(j):]
+            if len(cycle) == 1:
+                self_parents.append(j)
+            else:
+                cycles.append(cycle)
+        for k in chain:
+            state[k] = 2
+    
+    diagnostics = {
+        'policy': policy,
+        'duplicates': duplicates,
+        'self_parents': [tasks[i]['id'] for i in self_parents],
+        'orphans': [tasks[i]['id'] for i in orphans],
+        'missing_parents': list(dict.fromkeys(tasks[i]['parentId'] for i in orphans)),
+        'cycles': [[tasks[i]['id'] for i in cycle] for cycle in cycles],
+        'promoted': [],
+        'dropped': 0
     }
-    return emoji_map.get(category, "☑️")  # Return default emoji if category not found
+    tree.diagnostics = diagnostics
+    if not (duplicates or self_parents or orphans or cycles):
+        return diagnostics
+    if policy == 'fail':
+        raise TaskTreeError(f"Invalid task tree: {format_diagnostics(diagnostics)}", diagnostics)
+    
+    promoted = list(self_parents)
+    if cycles:
+        position = {i: k for k, i in enumerate(tree.order)}
+        promoted.extend(min(cycle, key=position.__getitem__) for cycle in cycles)
+    for i in promoted:
+        tree.detach(i)
+    if policy == 'promote':
+        for i in orphans:
+            # The missing parent is never walked, so its child list can be dropped
+            p = parent[i]
+            tree.first_child[p] = tree.last_child[p] = -1
+            parent[i] = -1
+            tree.next_sibling[i] = -1
+        promoted.extend(orphans)
+    
+    if promoted:
+        position = {i: k for k, i in enumerate(tree.order)}
+        tree.roots = array('l', sorted([*tree.roots, *promoted], key=position.__getitem__))
+        tree._preorder = None
+        tree._rollups = None
+    diagnostics['promoted'] = [tasks[i]['id'] for i in promoted]
+    diagnostics['dropped'] = len(tree) - len(tree.preorder())
+    return diagnostics
 
-def process_tasks(tasks):
-    """Process tasks and return a dictionary of parent-child relationships."""
-    task_dict = {}
-    root_tasks = []
-    
-    # First pass: Create dictionary of all tasks
-    for task in tasks:
-        task_dict[task['id']] = {
-            'task': task,
-            'children': []
+def format_diagnostics(diagnostics):
+    """Summarize a validate_task_tree report in one line ("" if the tree was valid)."""
+    parts = []
+    for key, label in (('duplicates', "duplicate id"), ('self_parents', "self-parented task"),
+                       ('orphans', "orphaned subtree"), ('cycles', "cycle")):
+        count = len(diagnostics[key])
+        if count:
+            parts.append(f"{count} {label}{'s' if count != 1 else ''}")
+    if diagnostics['promoted']:
+        parts.append(f"{len(diagnostics['promoted'])} promoted to roots")
+    if diagnostics['dropped']:
+        parts.append(f"{diagnostics['dropped']} tasks left out")
+    return ", ".join(parts)
+
+def build_task_tree(tasks, stats=NO_STATS, policy='promote'):
+    """Build a TaskTree from an iterable of tasks in a single pass.
+    
+    Any iterable works, including a generator that is still reading the
+    input file. A child that appears before its parent is linked to a
+    placeholder record which is filled in once the parent arrives. The
+    finished tree is checked and repaired by validate_task_tree according
+    to `policy`; None skips the check.
+    """
+    if isinstance(tasks, (TaskTree, DiskTaskTree)):
+        return tasks
+    tree = TaskTree()
+    with stats.stage('build_tree'):
+        for task in tasks:
+            tree.add(task)
+    if policy is not None:
+        with stats.stage('validate'):
+            diagnostics = validate_task_tree(tree, policy)
+        stats.count(**{key: len(value) for key, value in diagnostics.items()
+                       if key in ('duplicates', 'self_parents', 'orphans', 'cycles') and value})
+    
+    if stats.enabled:
+        max_depth = max((depth for _, depth in tree.walk()), default=0)
+        stats.count(tasks=len(tree), roots=len(tree.roots), max_depth=max_depth)
+    return tree
+
+class DiskTaskTree:
+    """Task tree kept in a temporary SQLite database for exports larger than RAM.
+    
+    Each task is one row, in input order, holding the task as JSON and the
+    row of its parent (-1 for roots, NULL while the parent is missing),
+    indexed on (parent, row). Every walk fetches one child at a time with
+    an indexed query, so only the path from the root to the current task is
+    held in memory however large the tree is. Build one with
+    build_disk_task_tree; write_markdown, write_canvas and
+    convert_to_targets accept it in place of a TaskTree. Links follow the
+    same rules as TaskTree and validate() the same rules as
+    validate_task_tree, so the output is identical. Close it, or use it as
+    a context manager, to delete the database.
+    """
+    
+    def __init__(self, path='', cache_kib=16384):
+        # An empty path is a private on-disk database SQLite deletes on close
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute(f"PRAGMA cache_size = -{int(cache_kib)}")
+        self.db.execute("PRAGMA journal_mode = OFF")
+        self.db.execute("PRAGMA synchronous = OFF")
+        self.db.execute("""
+            CREATE TABLE tasks (
+                seq INTEGER PRIMARY KEY,  -- Input order
+                id TEXT NOT NULL,         -- JSON-encoded id, so 1 and "1" stay apart
+                parent_id TEXT,           -- JSON-encoded parentId, NULL for roots
+                parent INTEGER,           -- seq of the parent, -1 for roots
+                estimate REAL NOT NULL,
+                completed INTEGER NOT NULL,
+                task TEXT NOT NULL
+            )""")
+        self.diagnostics = None  # Set by validate
+        self._layout = None      # Settings the layout table was computed with
+        self._placed = None      # Settings the positions were computed with
+    
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def close(self):
+        """Close the database, which deletes a temporary one."""
+        self.db.close()
+    
+    def load(self, tasks):
+        """Insert an iterable of tasks in input order and link them to their parents.
+        
+        Rows are inserted as the iterable is read. A child links to the first
+        task with its parent's id, like in TaskTree.
+        """
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        rows = ((encode(task['id']),
+                 None if task['parentId'] is None else encode(task['parentId']),
+                 task.get('estimate') or 0,
+                 1 if task.get('completed', False) else 0,
+                 encode(task))
+                for task in tasks)
+        insert = ("INSERT INTO tasks (id, parent_id, estimate, completed, task) "
+                  "VALUES (?, ?, ?, ?, ?)")
+        
+        self.db.execute("BEGIN")
+        self.db.executemany(insert, rows)
+        self.db.execute("""
+            CREATE TABLE first_ids AS
+            SELECT id, MIN(seq) AS seq FROM tasks GROUP BY id""")
+        self.db.execute("CREATE UNIQUE INDEX first_ids_id ON first_ids (id)")
+        self.db.execute("""
+            UPDATE tasks SET parent = CASE
+                WHEN parent_id IS NULL THEN -1
+                ELSE (SELECT seq FROM first_ids WHERE first_ids.id = tasks.parent_id)
+            END""")
+        self.db.execute("CREATE INDEX tasks_parent ON tasks (parent, seq)")
+        self.db.execute("COMMIT")
+        self._layout = self._placed = None
+    
+    def _reachable(self):
+        """Record every task reachable from a root in the `reached` table; return the count."""
+        self.db.execute("DROP TABLE IF EXISTS reached")
+        self.db.execute("CREATE TABLE reached (seq INTEGER PRIMARY KEY)")
+        self.db.execute("""
+            INSERT INTO reached
+            WITH RECURSIVE reach (seq) AS (
+                SELECT seq FROM tasks WHERE parent = -1
+                UNION ALL
+                SELECT tasks.seq FROM tasks JOIN reach ON tasks.parent = reach.seq
+            )
+            SELECT seq FROM reach""")
+        return self.db.execute("SELECT COUNT(*) FROM reached").fetchone()[0]
+    
+    def validate(self, policy='promote'):
+        """Find and repair broken links like validate_task_tree and return its diagnostics.
+        
+        Only the tasks that are not reachable from a root are read into
+        memory, to follow their parent chains.
+        """
+        if policy not in TREE_POLICIES:
+            raise ValueError(f"Unknown policy {policy!r}, expected one of {', '.join(TREE_POLICIES)}")
+        decode = json.loads
+        db = self.db
+        
+        duplicates = [decode(task_id) for task_id, in db.execute("""
+            SELECT tasks.id FROM tasks JOIN first_ids ON first_ids.id = tasks.id
+            WHERE tasks.seq != first_ids.seq ORDER BY tasks.seq""")]
+        
+        reachable = self._reachable()
+        unreached = {}
+        for seq, parent, task_id, parent_id in db.execute("""
+                SELECT seq, parent, id, parent_id FROM tasks
+                WHERE seq NOT IN (SELECT seq FROM reached) ORDER BY seq"""):
+            unreached[seq] = (parent, task_id, parent_id)
+        
+        self_parents = []
+        orphans = []
+        cycles = []
+        # 1: on the chain being followed, 2: already classified
+        state = {}
+        for i in unreached:
+            if i in state:
+                continue
+            chain = []
+            j = i
+            while j is not None and j in unreached and j not in state:
+                state[j] = 1
+                chain.append(j)
+                j = unreached[j][0]
+            if j is None:
+                orphans.append(chain[-1])
+            elif state.get(j) == 1:
+                cycle = chain[chain.index(j):]
+                if len(cycle) == 1:
+                    self_parents.append(j)
+                else:
+                    cycles.append(cycle)
+            for k in chain:
+                state[k] = 2
+        
+        def task_id(i):
+            return decode(unreached[i][1])
+        
+        diagnostics = {
+            'policy': policy,
+            'duplicates': duplicates,
+            'self_parents': [task_id(i) for i in self_parents],
+            'orphans': [task_id(i) for i in orphans],
+            'missing_parents': list(dict.fromkeys(decode(unreached[i][2]) for i in orphans)),
+            'cycles': [[task_id(i) for i in cycle] for cycle in cycles],
+            'promoted': [],
+            'dropped': 0
         }
+        self.diagnostics = diagnostics
+        if not (duplicates or self_parents or orphans or cycles):
+            return diagnostics
+        if policy == 'fail':
+            raise TaskTreeError(f"Invalid task tree: {format_diagnostics(diagnostics)}", diagnostics)
+        
+        # Rows are in input order, so the first task of a cycle has the lowest seq
+        promoted = self_parents + [min(cycle) for cycle in cycles]
+        if policy == 'promote':
+            promoted.extend(orphans)
+        if promoted:
+            db.execute("BEGIN")
+            db.executemany("UPDATE tasks SET parent = -1 WHERE seq = ?", ((i,) for i in promoted))
+            db.execute("COMMIT")
+            reachable = self._reachable()
+            self._layout = self._placed = None
+        diagnostics['promoted'] = [task_id(i) for i in promoted]
+        diagnostics['dropped'] = len(self) - reachable
+        return diagnostics
+    
+    def _next_child(self, parent, after):
+        """Return the first (seq, task JSON) row under `parent` after row `after`, or None."""
+        return self.db.execute(
+            "SELECT seq, task FROM tasks WHERE parent = ? AND seq > ? ORDER BY seq LIMIT 1",
+            (parent, after)).fetchone()
+    
+    def walk(self):
+        """Iterate (seq, depth, task) for every task reachable from the roots, pre-order."""
+        decode = json.loads
+        next_child = self._next_child
+        path = [[-1, -1]]  # [parent seq, last child visited] per level
+        while path:
+            level = path[-1]
+            row = next_child(level[0], level[1])
+            if row is None:
+                path.pop()
+                continue
+            seq, task = row
+            level[1] = seq
+            yield seq, len(path) - 1, decode(task)
+            path.append([seq, -1])
+    
+    def roots(self):
+        """Return the number of root tasks."""
+        return self.db.execute("SELECT COUNT(*) FROM tasks WHERE parent = -1").fetchone()[0]
+    
+    def measure(self, layout=None):
+        """Fill the `layout` table with subtree widths and totals in one post-order walk.
+        
+        Widths follow layout_task_tree and totals SubtreeTotals, one row per
+        reachable task; rows are written in chunks as subtrees finish.
+        """
+        settings = {**DEFAULT_CANVAS_LAYOUT, **(layout or {})}
+        node_width = settings['node_width']
+        child_spacing = settings['child_spacing']
+        if self._layout == (node_width, child_spacing):
+            return
+        db = self.db
+        db.execute("DROP TABLE IF EXISTS layout")
+        db.execute("""
+            CREATE TABLE layout (
+                seq INTEGER PRIMARY KEY, width INTEGER, children_width INTEGER,
+                estimate REAL, remaining REAL, done INTEGER, count INTEGER,
+                x INTEGER, y INTEGER
+            )""")
+        insert = ("INSERT INTO layout (seq, width, children_width, estimate, remaining, done, count) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?)")
+        query = ("SELECT seq, estimate, completed FROM tasks "
+                 "WHERE parent = ? AND seq > ? ORDER BY seq LIMIT 1")
+        
+        db.execute("BEGIN")
+        rows = []
+        # [seq, last child visited, children width, estimate, remaining, done, count]
+        frames = [[-1, -1, 0, 0.0, 0.0, 0, 0]]
+        while True:
+            frame = frames[-1]
+            row = db.execute(query, (frame[0], frame[1])).fetchone()
+            if row is not None:
+                seq, estimate, completed = row
+                frame[1] = seq
+                frames.append([seq, -1, 0, estimate, 0.0 if completed else estimate, completed, 1])
+                continue
+            frames.pop()
+            if not frames:
+                break
+            seq, _, children_total, estimate, remaining, done, count = frame
+            children_width = max(children_total - child_spacing, 0)
+            width = max(node_width, children_width)
+            rows.append((seq, width, children_width, estimate, remaining, done, count))
+            parent = frames[-1]
+            parent[2] += width + child_spacing
+            parent[3] += estimate
+            parent[4] += remaining
+            parent[5] += done
+            parent[6] += count
+            if len(rows) >= 4096:
+                db.executemany(insert, rows)
+                rows = []
+        db.executemany(insert, rows)
+        db.execute("COMMIT")
+        self._layout = (node_width, child_spacing)
+        self._placed = None
+    
+    def layout(self, layout=None):
+        """Compute canvas positions like layout_task_tree into the `layout` table."""
+        settings = {**DEFAULT_CANVAS_LAYOUT, **(layout or {})}
+        self.measure(settings)
+        key = tuple(sorted(settings.items()))
+        if self._placed == key:
+            return
+        node_width = settings['node_width']
+        vertical_spacing = settings['vertical_spacing']
+        db = self.db
+        query = ("SELECT tasks.seq, width, children_width FROM tasks JOIN layout USING (seq) "
+                 "WHERE parent = ? AND tasks.seq > ? ORDER BY tasks.seq LIMIT 1")
+        update = "UPDATE layout SET x = ?, y = ? WHERE seq = ?"
+        
+        db.execute("BEGIN")
+        rows = []
+        # [seq, last child visited, left of the next child's span, spacing after it]
+        path = [[-1, -1, 0, settings['horizontal_spacing']]]
+        while path:
+            level = path[-1]
+            row = db.execute(query, (level[0], level[1])).fetchone()
+            if row is None:
+                path.pop()
+                continue
+            seq, width, children_width = row
+            level[1] = seq
+            span_left = level[2]
+            level[2] += width + level[3]
+            rows.append((span_left + (width - node_width) // 2, (len(path) - 1) * vertical_spacing, seq))
+            path.append([seq, -1, span_left + (width - children_width) // 2, settings['child_spacing']])
+            if len(rows) >= 4096:
+                db.executemany(update, rows)
+                rows = []
+        db.executemany(update, rows)
+        db.execute("COMMIT")
+        self._placed = key
+    
+    def totals(self, seq):
+        """Return SubtreeTotals-style (remaining, done, count) for a task after measure()."""
+        return self.db.execute("SELECT remaining, done, count FROM layout WHERE seq = ?",
+                               (seq,)).fetchone()
+    
+    def iter_markdown_lines(self, show_timestamps=False, rollups=False, formatter=DEFAULT_FORMATTER):
+        """Yield markdown lines for every reachable task, like iter_tree_markdown_lines."""
+        if rollups:
+            self.measure()
+        for seq, depth, task in self.walk():
+            summary = None
+            if rollups and depth == 0:
+                summary = format_subtree_totals(*self.totals(seq), formatter)
+            yield format_markdown_line(task, depth, show_timestamps, summary, formatter)
+    
+    def iter_canvas_nodes(self, settings, rollups=False, formatter=DEFAULT_FORMATTER):
+        """Yield a canvas card for every task placed by layout(), in input order."""
+        decode = json.loads
+        for task, x, y, remaining, done, count in self.db.execute("""
+                SELECT task, x, y, remaining, done, count FROM tasks JOIN layout USING (seq)
+                ORDER BY seq"""):
+            task = decode(task)
+            if rollups and count > 1:
+                time_estimate = format_subtree_totals(remaining, done, count, formatter)
+            else:
+                time_estimate = formatter.estimate(task.get('estimate', 0))
+            yield {
+                'id': task['id'],
+                'type': 'text',
+                'text': f"{get_task_category_emoji(task.get('category', ''))} {task['text']}{time_estimate}",
+                'width': settings['node_width'],
+                'height': settings['node_height'],
+                'color': '1',
+                'x': x,
+                'y': y
+            }
+    
+    def iter_canvas_edges(self):
+        """Yield a canvas edge from every placed task's parent to it, in input order."""
+        decode = json.loads
+        for task_id, parent_id in self.db.execute("""
+                SELECT tasks.id, parents.id FROM tasks JOIN layout USING (seq)
+                JOIN tasks AS parents ON parents.seq = tasks.parent
+                ORDER BY tasks.seq"""):
+            task_id = decode(task_id)
+            parent_id = decode(parent_id)
+            yield {
+                'id': f"{parent_id}-{task_id}",
+                'fromNode': parent_id,
+                'toNode': task_id,
+                'label': ''
+            }
+
+def build_disk_task_tree(tasks, stats=NO_STATS, policy='promote', path=''):
+    """Load an iterable of tasks into a DiskTaskTree and check it like build_task_tree.
+    
+    `path` is the database file; the default is a temporary one that is
+    deleted when the tree is closed.
+    """
+    tree = DiskTaskTree(path)
+    with stats.stage('build_tree'):
+        tree.load(tasks)
+    if policy is not None:
+        with stats.stage('validate'):
+            diagnostics = tree.validate(policy)
+        stats.count(**{key: len(value) for key, value in diagnostics.items()
+                       if key in ('duplicates', 'self_parents', 'orphans', 'cycles') and value})
+    
+    if stats.enabled:
+        max_depth = max((depth for _, depth, _ in tree.walk()), default=0)
+        stats.count(tasks=len(tree), roots=tree.roots(), max_depth=max_depth)
+    return tree
+
+def normalize_timestamp(timestamp):
+    """Return a task timestamp in seconds (Goblin Tools exports use milliseconds)."""
+    if timestamp > 1000000000000:  # If timestamp is in milliseconds
+        return timestamp / 1000
+    return timestamp
+
+class TaskIndex:
+    """Query layer over a TaskTree: lookups by id, ancestry and task fields.
+    
+    Id and ancestor lookups use the tree's own arrays. Secondary indexes by
+    category, completion, estimate and timestamp are built once, on first
+    use, so extracting a subtree never pays for them. select() returns the
+    matching tasks, with their ancestors for context, ready to be rendered.
+    """
+    
+    def __init__(self, tree):
+        self.tree = tree
+        self._by_category = None
+        self._by_completed = None
+        self._by_estimate = None
+        self._by_timestamp = None
+    
+    def get(self, task_id):
+        """Return the index of a task id, or None. Numeric strings also match numbers."""
+        i = self.tree.index.get(task_id)
+        if i is None and isinstance(task_id, str) and task_id.lstrip('-').isdigit():
+            i = self.tree.index.get(int(task_id))
+        if i is None or self.tree.tasks[i] is None:
+            return None
+        return i
+    
+    def _require(self, task_id):
+        i = self.get(task_id)
+        if i is None:
+            raise ValueError(f"No task with id {task_id}")
+        return i
     
-    # Second pass: Build parent-child relationships
-    for task in tasks:
-        if task['parentId'] is None:
-            root_tasks.append(task_dict[task['id']])
+    def ancestors(self, task_id):
+        """Return the indices of a task's ancestors, nearest first."""
+        result = []
+        p = self.tree.parent[self._require(task_id)]
+        while p != -1 and self.tree.tasks[p] is not None:
+            result.append(p)
+            p = self.tree.parent[p]
+        return result
+    
+    def subtree(self, task_id):
+        """Return the indices of a task and its descendants in pre-order."""
+        return [i for i, _ in self.tree.walk([self._require(task_id)])]
+    
+    def by_category(self, emoji):
+        """Return the indices of tasks with a category emoji."""
+        if self._by_category is None:
+            self._by_category = {}
+            for i in self.tree.order:
+                self._by_category.setdefault(self.tree.categories[i], []).append(i)
+        return self._by_category.get(emoji, [])
+    
+    def by_completed(self, completed=True):
+        """Return the indices of completed (or open) tasks."""
+        if self._by_completed is None:
+            self._by_completed = {True: [], False: []}
+            for i in self.tree.order:
+                self._by_completed[bool(self.tree.tasks[i].get('completed', False))].append(i)
+        return self._by_completed[bool(completed)]
+    
+    def by_estimate(self, minimum=None, maximum=None):
+        """Return the indices of tasks whose estimate in seconds is in range.
+        
+        Tasks without an estimate count as 0.
+        """
+        if self._by_estimate is None:
+            self._by_estimate = _sorted_index(
+                (self.tree.tasks[i].get('estimate') or 0, i) for i in self.tree.order)
+        return _range_lookup(self._by_estimate, minimum, maximum)
+    
+    def by_timestamp(self, start=None, end=None):
+        """Return the indices of tasks created in a window of Unix seconds.
+        
+        Tasks without a timestamp never match.
+        """
+        if self._by_timestamp is None:
+            self._by_timestamp = _sorted_index(
+                (normalize_timestamp(self.tree.tasks[i]['timestamp']), i)
+                for i in self.tree.order if self.tree.tasks[i].get('timestamp'))
+        return _range_lookup(self._by_timestamp, start, end)
+    
+    def select(self, root_id=None, completed=None, category=None, min_estimate=None,
+               max_estimate=None, since=None, until=None):
+        """Return the tasks matching every given filter, ready to render.
+        
+        With only `root_id` this is that task's subtree, in O(size of the
+        subtree). Other filters keep the matching tasks plus their ancestors,
+        so the hierarchy still makes sense. The returned tasks are in
+        pre-order and the top-level ones are copies with parentId None.
+        """
+        tree = self.tree
+        tasks = tree.tasks
+        checks = []
+        if completed is not None:
+            checks.append((lambda: self.by_completed(completed),
+                           lambda i: bool(tasks[i].get('completed', False)) == completed))
+        if category is not None:
+            checks.append((lambda: self.by_category(category),
+                           lambda i: tree.categories[i] == category))
+        if min_estimate is not None or max_estimate is not None:
+            low = min_estimate if min_estimate is not None else float('-inf')
+            high = max_estimate if max_estimate is not None else float('inf')
+            checks.append((lambda: self.by_estimate(min_estimate, max_estimate),
+                           lambda i: low <= (tasks[i].get('estimate') or 0) <= high))
+        if since is not None or until is not None:
+            start = since if since is not None else float('-inf')
+            end = until if until is not None else float('inf')
+            checks.append((lambda: self.by_timestamp(since, until),
+                           lambda i: bool(tasks[i].get('timestamp'))
+                           and start <= normalize_timestamp(tasks[i]['timestamp']) <= end))
+        
+        top = None
+        if root_id is not None:
+            top = self._require(root_id)
+            roots = [top]
+            candidates = self.subtree(root_id) if checks else None
         else:
-            parent = task_dict.get(task['parentId'])
-            if parent:
-                parent['children'].append(task_dict[task['id']])
+            roots = tree.roots
+            candidates = None
+        
+        include = None
+        if checks:
+            if candidates is None:
+                # Start from the smallest index and test the other filters per task
+                lookups = sorted((lookup() for lookup, _ in checks), key=len)
+                candidates = lookups[0]
+            matches = [i for i in candidates if all(check(i) for _, check in checks)]
+            
+            # Keep ancestors up to the chosen root so the matches stay in place
+            include = set()
+            for i in matches:
+                while i != -1 and i not in include:
+                    include.add(i)
+                    if i == top:
+                        break
+                    i = tree.parent[i]
+        
+        selected = []
+        for i, depth in tree.walk(roots, include):
+            task = tasks[i]
+            if depth == 0 and task['parentId'] is not None:
+                task = {**task, 'parentId': None}
+            selected.append(task)
+        return selected
+
+def _sorted_index(pairs):
+    """Build a (keys, indices) pair of lists sorted by key."""
+    ordered = sorted(pairs)
+    return [key for key, _ in ordered], [i for _, i in ordered]
+
+def _range_lookup(index, minimum=None, maximum=None):
+    """Return the indices whose key lies in [minimum, maximum] in a sorted index."""
+    keys, indices = index
+    low = 0 if minimum is None else bisect.bisect_left(keys, minimum)
+    high = len(keys) if maximum is None else bisect.bisect_right(keys, maximum)
+    return indices[low:high]
+
+# Bump when the layout of TaskFileIndex sidecar files changes
+INDEX_VERSION = 1
+
+# JSON strings (escapes included) and brackets, for scanning raw bytes
+_JSON_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]')
+
+class TaskFileIndex:
+    """Random access to the tasks of a large task array file through mmap.
+    
+    The file is memory-mapped and described by a sidecar index (the input
+    path plus '.index' by default) holding each task's id, parentId, byte
+    span and tree links. The index is built with one scan of the file the
+    first time and rebuilt whenever the file's size or modification time no
+    longer match it. Lookups decode only the bytes of the tasks they return,
+    so extracting one root or one task's ancestors from a multi-GB export
+    never parses or copies the rest. Canvas files are not supported. Close
+    it, or use it as a context manager, to release the mapping.
+    
+    The sidecar is a JSON header line, the ids and the parentIds as one JSON
+    line each, then `starts`, `ends`, `first_child` and `next_sibling` as
+    packed 64-bit columns, so it loads without any per-task parsing.
+    """
+    COLUMNS = ('starts', 'ends', 'first_child', 'next_sibling')
+    
+    def __init__(self, file_path, index_path=None, stats=NO_STATS):
+        self.file_path = file_path
+        self.index_path = index_path or file_path + '.index'
+        self.stats = stats
+        self._map()
+        
+        self.built = not self._load()
+        if self.built:
+            with stats.stage('index'):
+                self._scan()
+            self._save()
+        # Reversed, so the first task with an id wins
+        self.index = dict(zip(reversed(self.ids), range(len(self.ids) - 1, -1, -1)))
+        stats.count(index_tasks=len(self.ids))
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def close(self):
+        """Release the memory mapping."""
+        self.data.close()
+    
+    def _map(self):
+        """Memory-map the file and record the signature the sidecar must match."""
+        with open(self.file_path, 'rb') as f:
+            info = os.fstat(f.fileno())
+            if not info.st_size:
+                raise json.JSONDecodeError("Expecting value", "", 0)
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.signature = {'size': info.st_size, 'mtime_ns': info.st_mtime_ns}
+    
+    def _load(self):
+        """Read the sidecar if it matches the file; return whether it did."""
+        try:
+            with open(self.index_path, 'rb') as f:
+                header = json.loads(f.readline())
+                if (not isinstance(header, dict) or header.get('version') != INDEX_VERSION
+                        or header.get('file') != self.signature):
+                    return False
+                self.ids = json.loads(f.readline())
+                self.parents = json.loads(f.readline())
+                for name in self.COLUMNS:
+                    column = array('q')
+                    column.frombytes(f.read(header['count'] * column.itemsize))
+                    setattr(self, name, column)
+        except (OSError, ValueError):
+            return False
+        return all(len(getattr(self, name)) == header['count'] for name in self.COLUMNS)
+    
+    def _save(self):
+        """Write the sidecar through a temporary file; a read-only location is skipped."""
+        temp_path = self.index_path + '.tmp'
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        header = {'version': INDEX_VERSION, 'file': self.signature, 'count': len(self.ids)}
+        try:
+            with open(temp_path, 'wb') as f:
+                for value in (header, self.ids, self.parents):
+                    f.write(encode(value).encode('utf-8') + b"\n")
+                for name in self.COLUMNS:
+                    getattr(self, name).tofile(f)
+            os.replace(temp_path, self.index_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    def _scan(self):
+        """Find every task object's byte span in one pass over the mapped file.
+        
+        Strings are skipped whole, so brackets inside task text are ignored.
+        Each task is decoded once, here, to record its id and parentId.
+        Children are then linked to the first task with their parent's id,
+        in input order, like in TaskTree.
+        """
+        data = self.data
+        start = re.match(rb'\s*', data).end()
+        if data[start:start + 1] != b'[':
+            raise ValueError("Indexed input must be a task array (canvas files are not supported)")
+        self.ids = []
+        self.parents = []
+        self.starts = array('q')
+        self.ends = array('q')
+        depth = 0
+        task_start = None
+        for match in _JSON_TOKEN.finditer(data, start):
+            token = data[match.start()]
+            if token == 0x22:  # '"'
+                continue
+            if token in b'[{':
+                depth += 1
+                if depth == 2:
+                    task_start = match.start()
+            else:
+                depth -= 1
+                if depth == 1:
+                    task = json.loads(data[task_start:match.end()])
+                    self.ids.append(task['id'])
+                    self.parents.append(task['parentId'])
+                    self.starts.append(task_start)
+                    self.ends.append(match.end())
+                elif depth == 0:
+                    break
+        if depth:
+            raise json.JSONDecodeError("Unexpected end of data", "", len(data))
+        
+        size = len(self.ids)
+        first = dict(zip(reversed(self.ids), range(size - 1, -1, -1)))
+        self.first_child = array('q', [-1]) * size
+        self.next_sibling = array('q', [-1]) * size
+        last_child = {}
+        for i, parent_id in enumerate(self.parents):
+            p = first.get(parent_id) if parent_id is not None else None
+            if p is None:
+                continue
+            if p in last_child:
+                self.next_sibling[last_child[p]] = i
+            else:
+                self.first_child[p] = i
+            last_child[p] = i
+    
+    def task(self, i):
+        """Decode the task at position `i` from its bytes in the file."""
+        return json.loads(self.data[self.starts[i]:self.ends[i]])
+    
+    def get(self, task_id):
+        """Return the position of a task id, or None. Numeric strings also match numbers."""
+        i = self.index.get(task_id)
+        if i is None and isinstance(task_id, str) and task_id.lstrip('-').isdigit():
+            i = self.index.get(int(task_id))
+        return i
+    
+    def _require(self, task_id):
+        i = self.get(task_id)
+        if i is None:
+            raise ValueError(f"No task with id {task_id}")
+        return i
     
-    return root_tasks
+    def children(self, i):
+        """Yield the positions of a task's children in input order."""
+        child = self.first_child[i]
+        while child != -1:
+            yield child
+            child = self.next_sibling[child]
+    
+    def ancestors(self, task_id):
+        """Return a task's ancestors as decoded tasks, nearest first."""
+        result = []
+        seen = set()
+        i = self._require(task_id)
+        while self.parents[i] is not None:
+            i = self.index.get(self.parents[i])
+            if i is None or i in seen:
+                break
+            seen.add(i)
+            result.append(self.task(i))
+        return result
+    
+    def subtree(self, task_id):
+        """Return the positions of a task and its descendants in pre-order.
+        
+        A cycle is cut where it would revisit a task.
+        """
+        result = []
+        seen = set()
+        stack = [self._require(task_id)]
+        while stack:
+            i = stack.pop()
+            if i in seen:
+                continue
+            seen.add(i)
+            result.append(i)
+            stack.extend(reversed(list(self.children(i))))
+        return result
+    
+    def select(self, root_id):
+        """Return a task's subtree as decoded tasks ready to render, like TaskIndex.select.
+        
+        The top-level task is returned with parentId None.
+        """
+        with self.stats.stage('decode'):
+            tasks = [self.task(i) for i in self.subtree(root_id)]
+        tasks[0]['parentId'] = None
+        self.stats.count(decoded=len(tasks))
+        return tasks
+    
+    def rewrite(self, replacements, chunk_size=1 << 20):
+        """Replace the bytes of some tasks and rewrite the file around them.
+        
+        `replacements` maps task positions to their new JSON bytes. All
+        other bytes are copied unchanged, chunk by chunk, to a temporary
+        file that then replaces the input. The byte spans are shifted and
+        the sidecar saved, so the index stays valid without a rescan.
+        """
+        if not replacements:
+            return
+        temp_path = self.file_path + '.tmp'
+        data = self.data
+        
+        def copy(f, start, end):
+            for offset in range(start, end, chunk_size):
+                f.write(data[offset:min(offset + chunk_size, end)])
+        
+        try:
+            with open(temp_path, 'wb') as f:
+                offset = 0
+                for i in sorted(replacements):
+                    copy(f, offset, self.starts[i])
+                    f.write(replacements[i])
+                    offset = self.ends[i]
+                copy(f, offset, len(data))
+            os.chmod(temp_path, os.stat(self.file_path).st_mode & 0o7777)
+            data.close()
+            os.replace(temp_path, self.file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            if data.closed:
+                self._map()
+        
+        delta = 0
+        for i in range(min(replacements), len(self.ids)):
+            start = self.starts[i] + delta
+            if i in replacements:
+                delta += len(replacements[i]) - (self.ends[i] - self.starts[i])
+            self.starts[i] = start
+            self.ends[i] += delta
+        self._save()
 
-def generate_markdown(task_node, level=0, show_timestamps=False):
-    """Generate markdown for a task and its children."""
-    task = task_node['task']
-    children = task_node['children']
-    indent = "  " * level
+# The start of a markdown item written by format_markdown_line
+_MARKDOWN_ITEM = re.compile(r'( *)- \[([ xX])\](?: |$)')
+_SUMMARY_SUFFIX = re.compile(r' \([^()]*\)$')
+# The value of a task's "completed" key, right after the key string
+_COMPLETED_VALUE = re.compile(rb'\s*:\s*(true|false|null|-?[0-9][0-9.eE+-]*)')
+_COMPLETED_FIELD = re.compile(rb'"completed"' + _COMPLETED_VALUE.pattern)
+_JSON_LITERALS = {b'true': True, b'false': False, b'null': None}
+
+def iter_markdown_checkboxes(lines):
+    """Parse a markdown document written by this converter back into its items.
+    
+    Yields (depth, completed, text, task_id) for every "## " root header
+    (depth 0, completed None) and every "- [ ]" or "- [x]" item, whose
+    depth is its indentation in pairs of spaces. `text` follows the
+    checkbox or header mark, still with any "(Created: ...)" suffix (see
+    strip_created), and task_id comes from an id marker (see
+    TaskFormatter.marker) or is None. Other lines are skipped.
+    """
+    for line in lines:
+        line = line.rstrip()
+        if line.startswith('## '):
+            yield 0, None, line[3:], None
+            continue
+        match = _MARKDOWN_ITEM.match(line)
+        if match is None:
+            continue
+        indent, mark = match.groups()
+        text = line[match.end():]
+        task_id = None
+        if text.endswith(' -->'):
+            marker = text.rfind(' <!-- id:')
+            if marker != -1:
+                task_id = unquote(text[marker + 9:-4])
+                text = text[:marker]
+        yield len(indent) // 2, mark != ' ', text, task_id
+
+def strip_created(text):
+    """Return an item's text without a trailing " (Created: ...)" timestamp, if it has one."""
+    if text.endswith(')'):
+        created = text.rfind(' (Created: ')
+        if created != -1 and ')' not in text[created:-1]:
+            return text[:created]
+    return text
+
+def match_markdown_items(tree, items, slot_of=None):
+    """Yield (tree index or None, completed) for each checkbox item, matched by text path.
+    
+    An item matches the task rendered with the same text and estimate under
+    the task its parent line matched (first as written, then without a
+    "(Created: ...)" timestamp, since task text may end like one), and a
+    root header the root with the same category and text (with any
+    estimate or rollup summary), so ticked
+    items are found again even after tasks elsewhere were added, removed or
+    reordered. Tasks with the same path are matched in document order.
+    `slot_of(task_id)` resolves the items that carry an id marker instead.
+    """
+    keys = {}
+    path = []
+    for i, depth in tree.walk():
+        del path[depth:]
+        task = tree.tasks[i]
+        if depth == 0:
+            header = f"{tree.categories[i]} {task['text']}"
+            keys.setdefault((-1, (header + DEFAULT_FORMATTER.estimate(task.get('estimate'))).rstrip()),
+                            []).append(i)
+            keys.setdefault((-1, header.rstrip()), []).append(i)
+        else:
+            body = task['text'] + DEFAULT_FORMATTER.estimate(task.get('estimate'))
+            keys.setdefault((path[-1], body.rstrip()), []).append(i)
+        path.append(i)
+    
+    for candidates in keys.values():
+        candidates.reverse()  # Popped from the end, in document order
+    used = set()
+    
+    def take(key):
+        candidates = keys.get(key)
+        while candidates:
+            i = candidates.pop()
+            if i not in used:
+                used.add(i)
+                return i
+        return None
+    
+    path = []
+    for depth, completed, text, task_id in items:
+        del path[depth:]
+        if len(path) < depth:  # Indented below an unmatched line
+            path.extend([None] * (depth - len(path)))
+        if task_id is not None and slot_of is not None:
+            i = slot_of(task_id)
+            if i is not None:
+                used.add(i)
+        elif depth == 0:
+            i = take((-1, text))
+            if i is None:
+                i = take((-1, _SUMMARY_SUFFIX.sub('', text)))
+        elif path[-1] is not None:
+            i = take((path[-1], text))
+            if i is None:
+                i = take((path[-1], strip_created(text)))
+        else:
+            i = None
+        path.append(i)
+        if completed is not None:
+            yield i, completed
+
+def find_completed_value(data):
+    """Return the match of a task's own "completed" value in its JSON bytes, or None.
+    
+    Keys of nested objects and strings that merely contain the word are
+    skipped; group 1 is the value.
+    """
+    if b'"completed"' not in data:
+        return None
+    if data.count(b'{') == 1 and b'[' not in data:
+        # A flat object, the usual case: the first key not inside a string is the one
+        for found in _COMPLETED_FIELD.finditer(data):
+            prefix = data[:found.start()]
+            if (len(prefix) - len(prefix.rstrip(b'\\'))) % 2 == 0:  # The quote is not escaped
+                return found
+        return None
+    depth = 0
+    for match in _JSON_TOKEN.finditer(data):
+        token = data[match.start()]
+        if token == 0x22:  # '"'
+            if depth == 1 and match.group() == b'"completed"':
+                found = _COMPLETED_VALUE.match(data, match.end())
+                if found:
+                    return found
+            continue
+        depth += 1 if token in b'[{' else -1
+    return None
+
+def set_task_completed(data, completed):
+    """Return a task's JSON bytes with its "completed" field set, touching nothing else.
+    
+    Returns None if the field already has that truth value. A task without
+    the field gets one at the start of the object.
+    """
+    value = b'true' if completed else b'false'
+    found = find_completed_value(data)
+    if found:
+        current = found.group(1)
+        current = _JSON_LITERALS[current] if current in _JSON_LITERALS else json.loads(current)
+        if bool(current) == completed:
+            return None
+        return data[:found.start(1)] + value + data[found.end(1):]
+    if not completed:
+        return None
+    # Keep the object's own indentation and separators
+    start = data.index(b'{') + 1
+    first = re.compile(rb'\s*').match(data, start).end()
+    indent = data[start:first]
+    colon = b': ' if b'": ' in data else b':'
+    comma = b',' + indent if indent else (b', ' if b', "' in data else b',')
+    return data[:first] + b'"completed"' + colon + value + comma + data[first:]
+
+def sync_markdown_to_tasks(markdown_file, input_file, stats=NO_STATS, policy='promote'):
+    """Copy the checkbox states of a generated markdown file back into its task array file.
+    
+    Items with an id marker are looked up through the input's
+    TaskFileIndex; only when some item has none is the task tree built to
+    match items by text path (see match_markdown_items), with `policy`
+    passed to validate_task_tree as when the markdown was written. Only the
+    tasks whose completed state differs are re-encoded, and only their
+    "completed" value changes (see TaskFileIndex.rewrite). Root headers
+    have no checkbox and are never changed. Canvas inputs hold no
+    completion state and are not supported.
+    
+    Returns a report with counts of checkbox 'items', 'matched' items,
+    'unmatched' items and 'updated' tasks.
+    """
+    with stats.stage('parse_markdown'):
+        with open(markdown_file, encoding='utf-8') as f:
+            items = list(iter_markdown_checkboxes(f))
+    
+    with TaskFileIndex(input_file, stats=stats) as file_index:
+        if all(task_id is not None for _, completed, _, task_id in items if completed is not None):
+            matches = [(file_index.get(task_id), completed)
+                       for _, completed, _, task_id in items if completed is not None]
+        else:
+            with stats.stage('match'):
+                tree = build_task_tree([file_index.task(i) for i in range(len(file_index))],
+                                       stats, policy)
+                position_of = {slot: position for position, slot in enumerate(tree.order)}
+                
+                def slot_of(task_id):
+                    position = file_index.get(task_id)
+                    return tree.order[position] if position is not None else None
+                
+                matches = [(position_of.get(i), completed)
+                           for i, completed in match_markdown_items(tree, items, slot_of)]
+        states = {i: completed for i, completed in matches if i is not None}
+        matched = sum(i is not None for i, _ in matches)
+        
+        with stats.stage('sync'):
+            data = file_index.data
+            replacements = {}
+            for i, completed in states.items():
+                patched = set_task_completed(data[file_index.starts[i]:file_index.ends[i]], completed)
+                if patched is not None:
+                    replacements[i] = patched
+            file_index.rewrite(replacements)
+    
+    report = {'items': len(matches), 'matched': matched, 'unmatched': len(matches) - matched,
+              'updated': len(replacements)}
+    stats.count(sync_items=len(matches), sync_updated=len(replacements))
+    return report
+
+# How merge_task_lists resolves two copies of a task whose fields differ
+MERGE_RULES = ('newest', 'completed')
+
+def merge_task_lists(task_lists, rule='newest', stats=NO_STATS):
+    """Join several task lists into one, keeping a single copy of each id.
+    
+    Tasks are matched through one dictionary keyed by id, so merging is
+    linear in the total number of tasks, and each list may be any iterable,
+    including an iter_input_tasks generator. When two copies differ the one
+    with the newest timestamp wins (the later input on a tie), parentId
+    included, so a task moved in a newer export is re-parented. The
+    'completed' rule does the same, except that a task stays completed once
+    any copy has it. Merged tasks keep the position where their id first
+    appeared.
+    
+    Returns (tasks, report) where report counts the inputs, the tasks
+    added, those updated by a later copy, the ids whose copies conflicted
+    and the identical copies dropped.
+    """
+    if rule not in MERGE_RULES:
+        raise ValueError(f"Unknown merge rule {rule!r}, expected one of {', '.join(MERGE_RULES)}")
+    merged = []
+    position = {}
+    updated = set()
+    conflicts = set()
+    inputs = 0
+    identical = 0
+    
+    def timestamp(task):
+        return normalize_timestamp(task.get('timestamp') or 0)
     
-    # Get emoji if it's a root task
-    emoji = get_task_category_emoji(task.get('category', '')) if level == 0 else ""
+    with stats.stage('merge'):
+        for tasks in task_lists:
+            inputs += 1
+            for task in tasks:
+                task_id = task['id']
+                k = position.get(task_id)
+                if k is None:
+                    position[task_id] = len(merged)
+                    merged.append(task)
+                    continue
+                current = merged[k]
+                if task == current:
+                    identical += 1
+                    continue
+                
+                conflicts.add(task_id)
+                winner, other = (task, current) if timestamp(task) >= timestamp(current) else (current, task)
+                if rule == 'completed' and other.get('completed') and not winner.get('completed'):
+                    winner = {**winner, 'completed': other['completed']}
+                if winner is not current and winner != current:
+                    merged[k] = winner
+                    updated.add(task_id)
+    
+    report = {
+        'rule': rule,
+        'inputs': inputs,
+        'added': len(merged),
+        'updated': len(updated),
+        'conflicts': len(conflicts),
+        'identical': identical
+    }
+    stats.count(**{f'merge_{key}': value for key, value in report.items() if key != 'rule'})
+    return merged, report
+
+def format_merge_report(report):
+    """Summarize a merge_task_lists report in one line."""
+    return (f"merged {report['inputs']} inputs into {report['added']} tasks, "
+            f"{report['updated']} updated, {report['conflicts']} conflicting, "
+            f"{report['identical']} identical copies dropped")
+
+def process_tasks(tasks):
+    """Process tasks and return a dictionary of parent-child relationships.
+    
+    This is a thin adapter over build_task_tree for callers that expect
+    nested {'task': ..., 'children': [...]} dictionaries.
+    """
+    return build_task_tree(tasks).to_nodes()
+
+def format_markdown_line(task, level=0, show_timestamps=False, summary=None,
+                         formatter=DEFAULT_FORMATTER):
+    """Format a single task as a markdown line (a header for root tasks).
+    
+    `summary`, e.g. from SubtreeTotals.format, replaces a root header's own
+    estimate. Estimates and timestamps come from `formatter`'s caches.
+    """
+    # For root tasks, add a header
+    if level == 0:
+        emoji = get_task_category_emoji(task.get('category', ''))
+        if summary is None:
+            summary = formatter.estimate(task.get('estimate'))
+        return f"\n## {emoji} {task['text']}{summary}"
+    
+    indent = "  " * level
     
     # Check if task is completed
     is_completed = task.get('completed', False)
     checkbox = "[x]" if is_completed else "[ ]"
     
     # Format the task line
-    task_line = f"{indent}- {checkbox} {task['text']}{format_estimate(task.get('estimate'))}"
+    task_line = f"{indent}- {checkbox} {task['text']}{formatter.estimate(task.get('estimate'))}"
     
     # Add timestamp if requested
     if show_timestamps and task.get('timestamp'):
-        timestamp = format_timestamp(task.get('timestamp'))
+        timestamp = formatter.timestamp(task.get('timestamp'))
         if timestamp:
             task_line += f" (Created: {timestamp})"
     
-    # For root tasks, add a header
-    if level == 0:
-        lines = [f"\n## {emoji} {task['text']}{format_estimate(task.get('estimate'))}"]
-    else:
-        lines = [task_line]
+    return task_line + formatter.marker(task)
+
+def iter_markdown_lines(task_node, level=0, show_timestamps=False):
+    """Yield markdown lines for a task and its children in document order.
     
-    # Add children
-    for child in children:
-        lines.extend(generate_markdown(child, level + 1, show_timestamps))
+    Uses an explicit stack instead of recursion, so arbitrarily deep task
+    trees neither hit the recursion limit nor copy child lists upwards.
+    """
+    stack = [(task_node, level)]
+    while stack:
+        node, depth = stack.pop()
+        yield format_markdown_line(node['task'], depth, show_timestamps)
+        
+        # Push children in reverse so the first child is rendered first
+        children = node['children']
+        for i in range(len(children) - 1, -1, -1):
+            stack.append((children[i], depth + 1))
+
+def generate_markdown(task_node, level=0, show_timestamps=False):
+    """Generate markdown for a task and its children."""
+    return list(iter_markdown_lines(task_node, level, show_timestamps))
+
+def iter_tree_markdown_lines(tree, show_timestamps=False, roots=None, rollups=False,
+                             formatter=DEFAULT_FORMATTER):
+    """Yield markdown lines for every task in a TaskTree in document order.
     
-    return lines
+    With `rollups`, root headers show the remaining estimate and progress of
+    their whole subtree instead of the root's own estimate.
+    """
+    if isinstance(tree, DiskTaskTree):
+        yield from tree.iter_markdown_lines(show_timestamps, rollups, formatter)
+        return
+    tasks = tree.tasks
+    totals = tree.rollups() if rollups else None
+    for i, depth in tree.walk(roots):
+        summary = totals.format(i, formatter) if totals is not None and depth == 0 else None
+        yield format_markdown_line(tasks[i], depth, show_timestamps, summary, formatter)
+
+def iter_document_lines(tasks, show_timestamps=False, rollups=False, formatter=DEFAULT_FORMATTER):
+    """Yield every line of the markdown document for a list of tasks or a TaskTree."""
+    yield "# Tasks"
+    yield from iter_tree_markdown_lines(build_task_tree(tasks), show_timestamps,
+                                        rollups=rollups, formatter=formatter)
+
+def write_markdown(tasks, output, show_timestamps=False, chunk_lines=1024, stats=NO_STATS,
+                   rollups=False, formatter=DEFAULT_FORMATTER):
+    """Stream the markdown document for tasks or a TaskTree to an open text file.
+    
+    Lines are written in buffered chunks as they are produced, so the full
+    document is never held in memory. The bytes written are identical to
+    convert_json_to_markdown's return value.
+    """
+    tree = build_task_tree(tasks, stats)
+    output = stats.timed_writer('write', output)
+    chunk = []
+    first = True
+    with stats.stage('render_markdown'), formatter.counting(stats):
+        for line in iter_document_lines(tree, show_timestamps, rollups, formatter):
+            if first:
+                chunk.append(line)
+                first = False
+            else:
+                chunk.append("\n" + line)
+            if len(chunk) >= chunk_lines:
+                output.write("".join(chunk))
+                chunk = []
+        if chunk:
+            output.write("".join(chunk))
 
-def convert_json_to_markdown(json_data, show_timestamps=False):
+def convert_json_to_markdown(json_data, show_timestamps=False, rollups=False,
+                             formatter=DEFAULT_FORMATTER):
     """Convert JSON task data to markdown format."""
     # Parse JSON if it's a string
     if isinstance(json_data, str):
         tasks = json.loads(json_data)
     else:
-        tasks = json_data
-    
-    # Process tasks into a tree structure
-    root_tasks = process_tasks(tasks)
+        tasks = json_data  # A task list or a prebuilt TaskTree
     
-    # Generate markdown
-    markdown_lines = ["# Tasks"]
-    for task_node in root_tasks:
-        markdown_lines.extend(generate_markdown(task_node, show_timestamps=show_timestamps))
-    
-    return "\n".join(markdown_lines)
+    return "\n".join(iter_document_lines(tasks, show_timestamps, rollups, formatter))
 
 def get_output_filename(input_file):
     """Generate output filename based on input filename."""
     base_name = os.path.splitext(input_file)[0]
     return f"{base_name}.md"
 
-def process_canvas_to_tasks(canvas_data):
-    """Convert Obsidian canvas data to task format."""
-    tasks = []
-    node_map = {}
+# How process_canvas_to_tasks handles a node with edges from several parents
+MULTI_PARENT_POLICIES = ('first', 'duplicate', 'fail')
+
+def get_canvas_node_text(node):
+    """Return the task text for a canvas node, or None for unsupported node types."""
+    node_type = node.get('type')
+    if node_type == 'text':
+        return node.get('text', '')
+    if node_type == 'file':
+        return f"[[{node.get('file', '')}{node.get('subpath', '')}]]"
+    if node_type == 'link':
+        return node.get('url', '')
+    if node_type == 'group':
+        return node.get('label') or "Group"
+    return None
+
+class CanvasGroupIndex:
+    """Grid index of canvas groups for finding the smallest group around a node.
+    
+    Groups are ranked by area, smallest first (ties in input order), and
+    registered in every grid cell they overlap. A group that contains a
+    node contains its top-left corner, so only the groups in that corner's
+    cell are candidates. Cells are the median group's size, so most groups
+    span a few cells; the few spanning more than `max_cells` are kept in
+    one list checked for every node instead.
+    """
     
-    # First pass: Create task entries for all nodes
+    def __init__(self, groups, max_cells=64):
+        groups = sorted(groups, key=lambda group: group.get('width', 0) * group.get('height', 0))
+        self.groups = groups
+        widths = sorted(group.get('width', 0) for group in groups)
+        heights = sorted(group.get('height', 0) for group in groups)
+        self.cell_width = max(widths[len(widths) // 2], 1) if groups else 1
+        self.cell_height = max(heights[len(heights) // 2], 1) if groups else 1
+        self.cells = {}
+        self.wide = []
+        for rank, group in enumerate(groups):
+            left, top = self._cell(group.get('x', 0), group.get('y', 0))
+            right, bottom = self._cell(group.get('x', 0) + group.get('width', 0),
+                                       group.get('y', 0) + group.get('height', 0))
+            if (right - left + 1) * (bottom - top + 1) > max_cells:
+                self.wide.append(rank)
+                continue
+            for column in range(left, right + 1):
+                for row in range(top, bottom + 1):
+                    self.cells.setdefault((column, row), []).append(rank)
+    
+    def __len__(self):
+        return len(self.groups)
+    
+    def _cell(self, x, y):
+        return int(x // self.cell_width), int(y // self.cell_height)
+    
+    def _first(self, ranks, node):
+        """Return the first rank in `ranks` whose group fully contains `node`, or None."""
+        x, y = node.get('x', 0), node.get('y', 0)
+        right, bottom = x + node.get('width', 0), y + node.get('height', 0)
+        area = node.get('width', 0) * node.get('height', 0)
+        is_group = node.get('type') == 'group'
+        for rank in ranks:
+            group = self.groups[rank]
+            width, height = group.get('width', 0), group.get('height', 0)
+            # Only strictly larger groups, so equal groups cannot contain each other
+            if group is node or (is_group and width * height <= area):
+                continue
+            gx, gy = group.get('x', 0), group.get('y', 0)
+            if gx <= x and gy <= y and right <= gx + width and bottom <= gy + height:
+                return rank
+        return None
+    
+    def enclosing(self, node):
+        """Return the id of the smallest group (sorted by area) that fully contains a node."""
+        cell = self.cells.get(self._cell(node.get('x', 0), node.get('y', 0)), ())
+        ranks = [rank for rank in (self._first(cell, node), self._first(self.wide, node))
+                 if rank is not None]
+        return self.groups[min(ranks)]['id'] if ranks else None
+
+def process_canvas_to_tasks(canvas_data, multi_parent='first', stats=NO_STATS):
+    """Convert Obsidian canvas data to task format.
+    
+    Text, file, link and group nodes become tasks and each edge makes its
+    source the parent of its target. A node without an incoming edge that
+    lies inside a group becomes a subtask of the smallest such group.
+    Siblings (and roots) are ordered top to bottom, then left to right, by
+    one sort of all nodes, and tasks are returned parents first.
+    
+    A node with edges from several parents keeps the first edge ('first'),
+    also appears as a copy without subtasks under every other parent
+    ('duplicate'), or raises TaskTreeError ('fail').
+    """
+    if multi_parent not in MULTI_PARENT_POLICIES:
+        raise ValueError(f"Unknown multi-parent policy {multi_parent!r}, "
+                         f"expected one of {', '.join(MULTI_PARENT_POLICIES)}")
+    timestamp = int(datetime.datetime.now().timestamp() * 1000)  # One import time for all tasks
+    
+    nodes = {}
+    texts = {}
     for node in canvas_data.get('nodes', []):
-        if node.get('type') == 'text':
-            task = {
-                'id': node['id'],
-                'parentId': None,  # Will be updated in second pass
-                'text': node.get('text', ''),
-                'timestamp': int(datetime.datetime.now().timestamp() * 1000),  # Current timestamp
-                'category': '📝'  # Default category for canvas items
-            }
-            tasks.append(task)
-            node_map[node['id']] = task
+        text = get_canvas_node_text(node)
+        if text is not None and node['id'] not in nodes:
+            nodes[node['id']] = node
+            texts[node['id']] = text
     
-    # Second pass: Process edges to establish parent-child relationships
+    # Parents of every node in edge order, ignoring self-loops and repeats
+    parents = {}
     for edge in canvas_data.get('edges', []):
-        from_node = node_map.get(edge['fromNode'])
-        to_node = node_map.get(edge['toNode'])
-        
-        if from_node and to_node:
-            to_node['parentId'] = from_node['id']
+        from_id, to_id = edge['fromNode'], edge['toNode']
+        if from_id in nodes and to_id in nodes and from_id != to_id:
+            node_parents = parents.setdefault(to_id, [])
+            if from_id not in node_parents:
+                node_parents.append(from_id)
+    
+    multi_parents = {node_id: ids for node_id, ids in parents.items() if len(ids) > 1}
+    if multi_parents and multi_parent == 'fail':
+        raise TaskTreeError(f"{len(multi_parents)} canvas nodes have several parents: "
+                            f"{', '.join(list(multi_parents)[:10])}",
+                            {'multi_parents': multi_parents})
     
+    groups = CanvasGroupIndex(node for node in nodes.values() if node.get('type') == 'group')
+    parent_of = {}
+    for node_id, node in nodes.items():
+        if node_id in parents:
+            parent_of[node_id] = parents[node_id][0]
+        elif groups:
+            parent_of[node_id] = groups.enclosing(node)
+    
+    # One sort puts every parent's children, and the roots, in visual order
+    position = {node_id: i for i, node_id in enumerate(nodes)}
+    ordered = sorted(nodes, key=lambda node_id: (nodes[node_id].get('y', 0),
+                                                 nodes[node_id].get('x', 0),
+                                                 position[node_id]))
+    children = {}
+    roots = []
+    for node_id in ordered:
+        # Entries are (node id, task id, parent task id)
+        parent_id = parent_of.get(node_id)
+        if parent_id is None:
+            roots.append((node_id, node_id, None))
+        else:
+            children.setdefault(parent_id, []).append((node_id, node_id, parent_id))
+        if multi_parent == 'duplicate':
+            for copy, parent_id in enumerate(multi_parents.get(node_id, [])[1:], 1):
+                children.setdefault(parent_id, []).append(
+                    (node_id, f"{node_id}-copy{copy}", parent_id))
+    
+    tasks = []
+    emitted = set()
+    
+    def make_task(node_id, task_id, parent_id):
+        node = nodes[node_id]
+        return {
+            'id': task_id,
+            'parentId': parent_id,
+            'text': texts[node_id],
+            'timestamp': timestamp,
+            'category': '📋' if node.get('type') == 'group' else '📝'
+        }
+    
+    stack = roots[::-1]
+    while stack:
+        node_id, task_id, parent_id = stack.pop()
+        tasks.append(make_task(node_id, task_id, parent_id))
+        if task_id == node_id:  # Copies do not repeat their subtasks
+            emitted.add(node_id)
+            stack.extend(reversed(children.get(node_id, [])))
+    
+    # Nodes only reachable through a cycle are left for the tree validator
+    for node_id in ordered:
+        if node_id not in emitted:
+            tasks.append(make_task(node_id, node_id, parent_of.get(node_id)))
+    
+    stats.count(canvas_multi_parent=len(multi_parents), canvas_groups=len(groups))
     return tasks
 
-def convert_tasks_to_canvas(tasks):
-    """Convert task data to Obsidian canvas format."""
-    nodes = []
-    edges = []
-    node_map = {}
+# Default canvas layout, in pixels. Every key can be overridden by passing a
+# partial dict as `layout` to convert_tasks_to_canvas.
+DEFAULT_CANVAS_LAYOUT = {
+    'node_width': 400,
+    'node_height': 100,
+    'horizontal_spacing': 100,  # Gap between neighbouring root task trees
+    'vertical_spacing': 150,    # Distance from a parent to its children
+    'child_spacing': 20         # Gap between neighbouring sibling subtrees
+}
+
+def layout_task_tree(tree, layout=None):
+    """Compute canvas positions for every task reachable in a TaskTree.
+    
+    Each depth is a row and every subtree gets its own horizontal span, so
+    no two cards overlap. Subtree widths are computed in one post-order pass
+    and positions in one pre-order pass, both iterative, so the whole layout
+    is O(n). Returns a list of (x, y) tuples indexed like the tree, with
+    None for tasks that are not reachable from a root.
+    """
+    settings = {**DEFAULT_CANVAS_LAYOUT, **(layout or {})}
+    node_width = settings['node_width']
+    vertical_spacing = settings['vertical_spacing']
+    child_spacing = settings['child_spacing']
+    first_child = tree.first_child
+    next_sibling = tree.next_sibling
+    
+    # Pre-order walk to get every node once, parents before children
+    order = tree.preorder()
     
-    # First pass: Create nodes for all tasks and identify root tasks
-    root_tasks = []
-    for task in tasks:
+    # Post-order pass: a subtree is as wide as its children side by side
+    widths = array('l', [0]) * len(tree.tasks)
+    children_widths = array('l', [0]) * len(tree.tasks)
+    for i, _ in reversed(order):
+        total = 0
+        child = first_child[i]
+        while child != -1:
+            total += widths[child] + child_spacing
+            child = next_sibling[child]
+        children_widths[i] = max(total - child_spacing, 0)
+        widths[i] = max(node_width, children_widths[i])
+    
+    # Pre-order pass: center each card over its span, children share the span
+    positions = [None] * len(tree.tasks)
+    span_lefts = array('l', [0]) * len(tree.tasks)
+    left = 0
+    for root in tree.roots:
+        span_lefts[root] = left
+        left += widths[root] + settings['horizontal_spacing']
+    for i, depth in order:
+        span_left = span_lefts[i]
+        positions[i] = (span_left + (widths[i] - node_width) // 2, depth * vertical_spacing)
+        
+        child_left = span_left + (widths[i] - children_widths[i]) // 2
+        child = first_child[i]
+        while child != -1:
+            span_lefts[child] = child_left
+            child_left += widths[child] + child_spacing
+            child = next_sibling[child]
+    
+    return positions
+
+def iter_canvas_nodes(tree, positions, settings, rollups=False, formatter=DEFAULT_FORMATTER):
+    """Yield a canvas card for every task placed by layout_task_tree, in input order.
+    
+    With `rollups`, cards of tasks with subtasks show their subtree's
+    remaining estimate and progress instead of their own estimate.
+    """
+    totals = tree.rollups() if rollups else None
+    for i in tree.order:
+        if positions[i] is None:
+            continue
+        task = tree.tasks[i]
+        
         # Format the card text with emoji and time estimate
-        emoji = get_task_category_emoji(task.get('category', ''))
-        time_estimate = format_estimate(task.get('estimate', 0))
-        card_text = f"{emoji} {task['text']}{time_estimate}"
+        if totals is not None and tree.first_child[i] != -1 and totals.count[i]:
+            time_estimate = totals.format(i, formatter)
+        else:
+            time_estimate = formatter.estimate(task.get('estimate', 0))
+        card_text = f"{tree.categories[i]} {task['text']}{time_estimate}"
         
         node = {
             'id': task['id'],
             'type': 'text',
             'text': card_text,
-            'width': 400,
-            'height': 100,
+            'width': settings['node_width'],
+            'height': settings['node_height'],
             'color': '1'
         }
-        nodes.append(node)
-        node_map[task['id']] = node
-        if task['parentId'] is None:
-            root_tasks.append(task)
-    
-    # Calculate layout
-    HORIZONTAL_SPACING = 500  # Space between parent tasks
-    VERTICAL_SPACING = 150    # Space between parent and children
-    CHILD_SPACING = 120      # Space between sibling tasks
-    
-    # Position root tasks horizontally
-    for i, task in enumerate(root_tasks):
-        node = node_map[task['id']]
-        node['x'] = i * HORIZONTAL_SPACING
-        node['y'] = 0
-        
-        # Position children vertically below their parent
-        children = [t for t in tasks if t['parentId'] == task['id']]
-        for j, child in enumerate(children):
-            child_node = node_map[child['id']]
-            child_node['x'] = node['x']  # Align with parent
-            child_node['y'] = node['y'] + VERTICAL_SPACING + (j * CHILD_SPACING)
-    
-    # Create edges for parent-child relationships
-    for task in tasks:
-        if task['parentId'] is not None:
-            edge = {
-                'id': f"{task['parentId']}-{task['id']}",
-                'fromNode': task['parentId'],
+        node['x'], node['y'] = positions[i]
+        yield node
+
+def iter_canvas_edges(tree, positions):
+    """Yield a canvas edge from every placed task's parent to it, in input order."""
+    for i in tree.order:
+        p = tree.parent[i]
+        if p != -1 and positions[i] is not None:
+            task = tree.tasks[i]
+            parent_id = tree.tasks[p]['id']
+            yield {
+                'id': f"{parent_id}-{task['id']}",
+                'fromNode': parent_id,
                 'toNode': task['id'],
                 'label': ''
             }
-            edges.append(edge)
+
+def iter_canvas_items(tree, settings, stats=NO_STATS, rollups=False, formatter=DEFAULT_FORMATTER):
+    """Lay out a TaskTree or DiskTaskTree and return its (nodes, edges) iterators."""
+    with stats.stage('layout'):
+        if isinstance(tree, DiskTaskTree):
+            tree.layout(settings)
+            return tree.iter_canvas_nodes(settings, rollups, formatter), tree.iter_canvas_edges()
+        positions = layout_task_tree(tree, settings)
+    return (iter_canvas_nodes(tree, positions, settings, rollups, formatter),
+            iter_canvas_edges(tree, positions))
+
+def convert_tasks_to_canvas(tasks, layout=None, stats=NO_STATS, rollups=False,
+                            formatter=DEFAULT_FORMATTER):
+    """Convert task data (a task list or a TaskTree) to Obsidian canvas format.
+    
+    With `rollups`, cards of tasks with subtasks show their subtree's
+    remaining estimate and progress instead of their own estimate.
+    """
+    settings = {**DEFAULT_CANVAS_LAYOUT, **(layout or {})}
     
+    # Lay out the whole tree using the same index as the markdown renderer
+    tree = build_task_tree(tasks, stats)
+    node_items, edge_items = iter_canvas_items(tree, settings, stats, rollups, formatter)
+    
+    with stats.stage('render_canvas'), formatter.counting(stats):
+        nodes = list(node_items)
+        edges = list(edge_items)
+    
+    stats.count(nodes=len(nodes), edges=len(edges))
     return {
         'nodes': nodes,
         'edges': edges
     }
 
+def write_json_array(output, items, encode, indent=None, chunk_items=1024):
+    """Write an iterable as a JSON array in chunks and return the item count.
+    
+    `indent` is the indentation of the items, matching json.dump's layout
+    for an array nested one level deep; None writes everything on one line.
+    """
+    pad = None if indent is None else "\n" + " " * indent
+    chunk = ["["]
+    count = 0
+    for item in items:
+        text = encode(item)
+        if pad is not None:
+            text = pad + text.replace("\n", pad)
+        chunk.append("," + text if count else text)
+        count += 1
+        if len(chunk) >= chunk_items:
+            output.write("".join(chunk))
+            chunk = []
+    chunk.append("\n" + " " * (indent - 2) + "]" if pad is not None and count else "]")
+    output.write("".join(chunk))
+    return count
+
+def write_canvas(tasks, output, layout=None, compact=False, chunk_items=1024, stats=NO_STATS,
+                 rollups=False, formatter=DEFAULT_FORMATTER):
+    """Stream the Obsidian canvas for tasks or a TaskTree to an open text file.
+    
+    Cards and edges are encoded and written in chunks as they are produced,
+    so the canvas is never held in memory as one dictionary or string. The
+    default output is identical to json.dump(convert_tasks_to_canvas(...),
+    indent=2); `compact` drops the whitespace and writes emoji as UTF-8
+    instead of escape sequences, which Obsidian reads just the same.
+    """
+    settings = {**DEFAULT_CANVAS_LAYOUT, **(layout or {})}
+    tree = build_task_tree(tasks, stats)
+    node_items, edge_items = iter_canvas_items(tree, settings, stats, rollups, formatter)
+    
+    output = stats.timed_writer('write', output)
+    if compact:
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        indent = None
+        opening, middle, closing = '{"nodes":', ',"edges":', '}'
+    else:
+        encode = json.JSONEncoder(indent=2).encode
+        indent = 4
+        opening, middle, closing = '{\n  "nodes": ', ',\n  "edges": ', '\n}'
+    
+    with stats.stage('render_canvas'), formatter.counting(stats):
+        output.write(opening)
+        nodes = write_json_array(output, node_items, encode, indent, chunk_items)
+        output.write(middle)
+        edges = write_json_array(output, edge_items, encode, indent, chunk_items)
+        output.write(closing)
+    stats.count(nodes=nodes, edges=edges)
+
+def render_markdown_target(tree, output, options, stats=NO_STATS):
+    """Output renderer: write the markdown document for a TaskTree."""
+    write_markdown(tree, output, options.get('show_timestamps', False), stats=stats,
+                   rollups=options.get('rollups', False),
+                   formatter=options.get('formatter', DEFAULT_FORMATTER))
+
+def render_canvas_target(tree, output, options, stats=NO_STATS):
+    """Output renderer: stream the Obsidian canvas for a TaskTree."""
+    write_canvas(tree, output, options.get('layout'), options.get('compact', False),
+                 stats=stats, rollups=options.get('rollups', False),
+                 formatter=options.get('formatter', DEFAULT_FORMATTER))
+
+# Output formats by name: file extension and render(tree, output, options, stats)
+OUTPUT_RENDERERS = {}
+
+def register_renderer(name, extension, render):
+    """Register an output format for convert_to_targets."""
+    OUTPUT_RENDERERS[name] = {'extension': extension, 'render': render}
+
+register_renderer('markdown', '.md', render_markdown_target)
+register_renderer('canvas', '.canvas', render_canvas_target)
+
+def write_text_file(output_file, write):
+    """Open a text file for writing and pass it to `write`. Returns True."""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        write(f)
+    return True
+
+def convert_to_targets(tasks, base_name, targets=('markdown', 'canvas'), options=None,
+                       stats=NO_STATS, write_file=write_text_file):
+    """Build the task tree once and write every requested output format.
+    
+    `targets` are names from OUTPUT_RENDERERS and each output is written to
+    `base_name` plus the format's extension. The tree and its pre-order walk
+    are shared by all renderers, and the outputs are written concurrently on
+    threads (in turn when stats are enabled, so stages do not overlap, and
+    for a DiskTaskTree, whose database connection they would share).
+    `write_file(path, write)` opens the output and returns whether it was
+    written. Returns a dictionary of target name to (output_file, written).
+    """
+    options = options or {}
+    tree = build_task_tree(tasks, stats)
+    on_disk = isinstance(tree, DiskTaskTree)
+    if not on_disk:
+        tree.preorder()
+    
+    def write_target(name):
+        renderer = OUTPUT_RENDERERS[name]
+        output_file = base_name + renderer['extension']
+        written = write_file(output_file, lambda f: renderer['render'](tree, f, options, stats))
+        return name, (output_file, written)
+    
+    if stats.enabled or len(targets) <= 1 or on_disk:
+        return dict(write_target(name) for name in targets)
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        return dict(executor.map(write_target, targets))
+
+# Characters Obsidian does not allow in note names
+NOTE_NAME_FORBIDDEN = set('\\/:*?"<>|#^[]')
+
+def get_note_name(text, used):
+    """Turn task text into a note name that is not yet in `used` (lowercase names).
+    
+    Forbidden characters become spaces, names are capped at 100 characters
+    and a repeated name gets a " (2)", " (3)"... suffix. The name is added to
+    `used`.
+    """
+    name = "".join(" " if char in NOTE_NAME_FORBIDDEN or char < " " else char for char in text)
+    name = " ".join(name.split())[:100].strip(". ") or "Untitled"
+    candidate = name
+    number = 2
+    while candidate.lower() in used:
+        candidate = f"{name} ({number})"
+        number += 1
+    used.add(candidate.lower())
+    return candidate
+
+def write_split_markdown(tasks, base_name, show_timestamps=False, rollups=False, stats=NO_STATS,
+                         write_file=write_text_file, jobs=None, formatter=DEFAULT_FORMATTER):
+    """Write one markdown note per root task plus an index note linking to them.
+    
+    Notes go in a folder named `base_name`, named after their root task, and
+    the index is `base_name` + ".md" with each root's estimate (or subtree
+    totals with `rollups`). Notes are rendered and written concurrently on
+    up to `jobs` threads (in turn when stats are enabled). Returns
+    ((index_file, written), [(note_file, written), ...]).
+    """
+    tree = build_task_tree(tasks, stats)
+    tree.preorder()
+    totals = tree.rollups() if rollups else None
+    folder_name = os.path.basename(base_name)
+    os.makedirs(base_name, exist_ok=True)
+    
+    used = set()
+    notes = []
+    for root in tree.roots:
+        name = get_note_name(tree.tasks[root]['text'], used)
+        notes.append((root, name, os.path.join(base_name, name + ".md")))
+    
+    def write_note(note):
+        root, _, note_file = note
+        # Drop the blank line that separates root sections in a single document
+        document = "\n".join(iter_tree_markdown_lines(tree, show_timestamps, [root], rollups,
+                                                       formatter))[1:]
+        return note_file, write_file(note_file, lambda f: f.write(document))
+    
+    with stats.stage('render_markdown'), formatter.counting(stats):
+        if stats.enabled or jobs == 1 or len(notes) <= 1:
+            written = [write_note(note) for note in notes]
+        else:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                written = list(executor.map(write_note, notes))
+        
+        lines = ["# Tasks", ""]
+        for root, name, _ in notes:
+            task = tree.tasks[root]
+            label = f"{tree.categories[root]} {task['text']}".replace("[", "\\[").replace("]", "\\]")
+            summary = (totals.format(root, formatter) if totals is not None
+                       else formatter.estimate(task.get('estimate')))
+            lines.append(f"- [{label}]({quote(f'{folder_name}/{name}.md')}){summary}")
+        index_file = base_name + ".md"
+        index_written = write_file(index_file, lambda f: f.write("\n".join(lines)))
+    
+    stats.count(notes=len(notes))
+    return (index_file, index_written), written
+
+def iter_json_array(f, chunk_size=65536, prefix=""):
+    """Yield the elements of a top-level JSON array from an open text file.
+    
+    The file is read in chunks and each element is decoded as soon as it is
+    complete, so only one element (plus one chunk of raw text) is held in
+    memory at a time. `prefix` is text already read from `f` by the caller.
+    Malformed input raises json.JSONDecodeError.
+    """
+    decoder = json.JSONDecoder()
+    buffer = prefix
+    pos = 0
+    eof = False
+    state = 'start'  # start -> first -> (value -> separator)* -> done
+    
+    while True:
+        # Skip whitespace, reading more of the file as needed
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer = f.read(chunk_size)
+            pos = 0
+            eof = not buffer
+        
+        if state == 'done':
+            if pos < len(buffer):
+                raise json.JSONDecodeError("Extra data", buffer, pos)
+            return
+        if pos >= len(buffer):
+            raise json.JSONDecodeError("Unexpected end of data", buffer, pos)
+        
+        char = buffer[pos]
+        if state == 'start':
+            if char != '[':
+                raise json.JSONDecodeError("Expecting '['", buffer, pos)
+            pos += 1
+            state = 'first'
+            continue
+        if state == 'separator' or (state == 'first' and char == ']'):
+            if char == ']':
+                pos += 1
+                state = 'done'
+            elif char == ',' and state == 'separator':
+                pos += 1
+                state = 'value'
+            else:
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+            continue
+        
+        # Drop already-decoded text so the buffer stays around one chunk
+        if pos >= chunk_size:
+            buffer = buffer[pos:]
+            pos = 0
+        
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            end = None
+        
+        # An element that runs into the end of the buffer may be incomplete
+        if end is None or (end == len(buffer) and not eof):
+            more = f.read(max(chunk_size, len(buffer) - pos))
+            buffer = buffer[pos:] + more
+            pos = 0
+            eof = not more
+            continue
+        
+        yield value
+        pos = end
+        state = 'separator'
+
+def detect_document_type(f):
+    """Peek at an open JSON file and tell a task array from a canvas.
+    
+    Returns a (document_type, prefix) tuple where document_type is 'tasks'
+    for a top-level array and 'canvas' for a top-level object, and prefix is
+    the text consumed while peeking, to be handed back to the reader.
+    """
+    prefix = ""
+    while True:
+        chunk = f.read(4096)
+        if not chunk:
+            raise json.JSONDecodeError("Expecting value", prefix, len(prefix))
+        prefix += chunk
+        stripped = prefix.lstrip()
+        if stripped:
+            break
+    
+    if stripped[0] == '[':
+        return 'tasks', prefix
+    if stripped[0] == '{':
+        return 'canvas', prefix
+    raise json.JSONDecodeError("Expecting '[' or '{'", prefix, len(prefix) - len(stripped))
+
+def iter_tasks_from_stream(f, stats=NO_STATS, multi_parent='first'):
+    """Yield tasks one at a time from an open task array or canvas file.
+    
+    `multi_parent` is passed to process_canvas_to_tasks for canvas input.
+    """
+    document_type, prefix = detect_document_type(f)
+    
+    if document_type == 'tasks':
+        yield from stats.timed('parse', iter_json_array(f, prefix=prefix))
+        return
+    
+    # Canvas edges can re-parent any node, so the document is read whole
+    with stats.stage('parse'):
+        data = json.loads(prefix + f.read())
+    if 'nodes' in data and 'edges' in data:
+        with stats.stage('canvas_import'):
+            tasks = process_canvas_to_tasks(data, multi_parent, stats)
+        stats.count(canvas_nodes=len(data['nodes']), canvas_edges=len(data['edges']))
+        yield from tasks
+    else:
+        raise ValueError("JSON object is not a canvas (expected 'nodes' and 'edges')")
+
+def iter_input_tasks(file_path, stats=NO_STATS, multi_parent='first'):
+    """Yield tasks one at a time from a .goblin or .json file."""
+    _, ext = os.path.splitext(file_path)
+    if ext.lower() not in ['.json', '.goblin']:
+        raise ValueError(f"Unsupported file format: {ext.lower()}")
+    
+    with open(file_path, 'r', encoding='utf-8') as f:
+        yield from iter_tasks_from_stream(f, stats, multi_parent)
+
 def get_input_file():
     """Prompt user for input file and validate it exists."""
     while True:
@@ -303,26 +2572,16 @@ def detect_file_format(file_path):
     _, ext = os.path.splitext(file_path)
     return ext.lower()
 
-def read_input_file(file_path):
+def read_input_file(file_path, stats=NO_STATS):
     """Read and parse the input file based on its format."""
     file_format = detect_file_format(file_path)
     
+    if file_format not in ['.goblin', '.json']:
+        raise ValueError(f"Unsupported file format: {file_format}")
+    
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            
-        if file_format == '.goblin':
-            # Goblin files are JSON arrays of tasks
-            return json.loads(content)
-        elif file_format == '.json':
-            data = json.loads(content)
-            # Check if it's a canvas format (has nodes and edges)
-            if 'nodes' in data and 'edges' in data:
-                return process_canvas_to_tasks(data)
-            # Otherwise assume it's a direct task array
-            return data
-        else:
-            raise ValueError(f"Unsupported file format: {file_format}")
+        # Tasks are decoded incrementally, so the raw text is never held whole
+        return list(iter_input_tasks(file_path, stats))
             
     except json.JSONDecodeError as e:
         raise ValueError(f"Error parsing {file_format} file: {str(e)}")
@@ -331,6 +2590,9 @@ def read_input_file(file_path):
 
 def main():
     """Main function to convert task files to markdown."""
+    # Per-stage timings are printed after the conversion with --profile
+    stats = ConversionStats() if "--profile" in sys.argv else NO_STATS
+    
     try:
         # Get input file
         input_file = get_input_file()
@@ -339,26 +2601,29 @@ def main():
             return
 
         # Read and process the input file
-        tasks = read_input_file(input_file)
+        tasks = read_input_file(input_file, stats)
         
         # Get output format and timestamp option
         output_format = get_output_format()
         show_timestamps = get_timestamp_option()
         
-        # Generate output
-        if output_format == 'markdown':
-            output = convert_json_to_markdown(tasks, show_timestamps)
-            output_file = get_output_filename(input_file)
-        else:  # canvas format
-            output = json.dumps(convert_tasks_to_canvas(tasks), indent=2)
-            output_file = os.path.splitext(input_file)[0] + '.canvas'
-        
-        # Write output to file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(output)
+        # Generate every requested format from a single tree
+        tree = build_task_tree(tasks, stats)
+        if format_diagnostics(tree.diagnostics):
+            print(f"Warning: repaired invalid task tree: {format_diagnostics(tree.diagnostics)}")
+        targets = {'1': ['markdown'], '2': ['canvas'], '3': ['markdown', 'canvas']}[output_format]
+        base_name = os.path.splitext(input_file)[0]
+        outputs = convert_to_targets(tree, base_name, targets,
+                                     {'show_timestamps': show_timestamps}, stats)
+        output_file = " and ".join(path for path, _ in outputs.values())
             
         print(f"Successfully converted {input_file} to {output_file}")
         
+        if stats.enabled:
+            stats.finish()
+            print()
+            print(format_stats_table(stats.to_dict()))
+        
     except Exception as e:
         print(f"Error: {str(e)}")
         sys.exit(1)
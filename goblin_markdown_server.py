@@ -0,0 +1,298 @@
+"""
+Goblin Markdown Converter Server v1.0
+A long-running local HTTP service for converting Goblin Tools task lists.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from goblin_markdown_converter import convert_json_to_markdown, convert_tasks_to_canvas
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024  # Largest request body accepted
+DEFAULT_MAX_PENDING = 256            # Conversions queued or running at once
+
+def convert_item(output_format, tasks, show_timestamps=False):
+    """Worker: convert one task list to 'markdown' or 'canvas' text."""
+    if output_format == 'markdown':
+        return convert_json_to_markdown(tasks, show_timestamps)
+    if output_format == 'canvas':
+        return json.dumps(convert_tasks_to_canvas(tasks), indent=2)
+    raise ValueError(f"Unknown format: {output_format}")
+
+class ServiceCounters:
+    """Thread-safe throughput and latency counters for the service."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.items = 0
+        self.errors = 0
+        self.rejected = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+    
+    def record(self, items=0, errors=0, latency=0.0, rejected=0):
+        """Add one finished request to the counters."""
+        with self._lock:
+            self.requests += 1
+            self.items += items
+            self.errors += errors
+            self.rejected += rejected
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+    
+    def snapshot(self):
+        """Return the counters with derived averages as a dictionary."""
+        with self._lock:
+            uptime = time.time() - self.started
+            return {
+                'uptime_seconds': round(uptime, 3),
+                'requests': self.requests,
+                'items': self.items,
+                'errors': self.errors,
+                'rejected': self.rejected,
+                'items_per_second': round(self.items / uptime, 3) if uptime else 0.0,
+                'avg_latency_ms': round(self.total_latency / self.requests * 1000, 3) if self.requests else 0.0,
+                'max_latency_ms': round(self.max_latency * 1000, 3)
+            }
+
+class ConversionService:
+    """A bounded process pool shared by every request to the server."""
+    
+    def __init__(self, workers=None, max_pending=DEFAULT_MAX_PENDING, max_bytes=DEFAULT_MAX_BYTES):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.max_bytes = max_bytes
+        self.counters = ServiceCounters()
+    
+    def submit(self, output_format, tasks, show_timestamps=False, wait=False):
+        """Queue a conversion, or return None when the pool is saturated.
+        
+        With `wait` it blocks until a slot frees up instead, which is how the
+        later items of an admitted bulk request are queued.
+        """
+        if not self.slots.acquire(blocking=wait):
+            return None
+        future = self.executor.submit(convert_item, output_format, tasks, show_timestamps)
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+    
+    def shutdown(self):
+        """Stop the worker processes."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+def parse_item(data):
+    """Split a request payload into (tasks, show_timestamps).
+    
+    A payload is either a bare task array or an object with 'tasks' and an
+    optional 'show_timestamps'.
+    """
+    if isinstance(data, list):
+        return data, False
+    if isinstance(data, dict) and isinstance(data.get('tasks'), list):
+        return data['tasks'], bool(data.get('show_timestamps', False))
+    raise ValueError("Expected a task array or an object with a 'tasks' array")
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    """HTTP endpoints for the conversion service.
+    
+    POST /markdown and POST /canvas convert one task list. POST /bulk takes
+    {"items": [{"id", "format", "tasks", "show_timestamps"}, ...]} and
+    returns one result per item. GET /stats returns the counters and
+    GET /health answers "ok".
+    """
+    server_version = "GoblinMarkdown/1.0"
+    service = None  # Set by make_server
+    
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+    
+    def send_body(self, status, body, content_type):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def send_json(self, status, data):
+        self.send_body(status, json.dumps(data), 'application/json; charset=utf-8')
+    
+    def read_json(self):
+        """Read and decode the request body, enforcing the size limit.
+        
+        Returns the decoded value, or None after sending an error response.
+        """
+        length = self.headers.get('Content-Length')
+        if length is None:
+            self.send_json(411, {'error': "Content-Length required"})
+            return None
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_json(400, {'error': "Invalid Content-Length"})
+            return None
+        if length > self.service.max_bytes:
+            self.send_json(413, {'error': f"Request body exceeds {self.service.max_bytes} bytes"})
+            return None
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError as e:
+            self.send_json(400, {'error': f"Invalid JSON: {str(e)}"})
+            return None
+    
+    def do_GET(self):
+        if self.path == '/stats':
+            self.send_json(200, {**self.service.counters.snapshot(), 'workers': self.service.workers})
+        elif self.path == '/health':
+            self.send_body(200, "ok", 'text/plain; charset=utf-8')
+        else:
+            self.send_json(404, {'error': "Not found"})
+    
+    def do_POST(self):
+        start = time.perf_counter()
+        if self.path in ('/markdown', '/canvas'):
+            self.handle_single(self.path[1:], start)
+        elif self.path == '/bulk':
+            self.handle_bulk(start)
+        else:
+            self.send_json(404, {'error': "Not found"})
+    
+    def handle_single(self, output_format, start):
+        counters = self.service.counters
+        data = self.read_json()
+        if data is None:
+            counters.record(errors=1, latency=time.perf_counter() - start)
+            return
+        try:
+            tasks, show_timestamps = parse_item(data)
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            counters.record(errors=1, latency=time.perf_counter() - start)
+            return
+        
+        future = self.service.submit(output_format, tasks, show_timestamps)
+        if future is None:
+            self.send_json(503, {'error': "Server busy, try again later"})
+            counters.record(rejected=1, latency=time.perf_counter() - start)
+            return
+        try:
+            output = future.result()
+        except Exception as e:
+            self.send_json(422, {'error': str(e)})
+            counters.record(errors=1, latency=time.perf_counter() - start)
+            return
+        
+        if output_format == 'markdown':
+            self.send_body(200, output, 'text/markdown; charset=utf-8')
+        else:
+            self.send_body(200, output, 'application/json; charset=utf-8')
+        counters.record(items=1, latency=time.perf_counter() - start)
+    
+    def handle_bulk(self, start):
+        counters = self.service.counters
+        data = self.read_json()
+        if data is None:
+            counters.record(errors=1, latency=time.perf_counter() - start)
+            return
+        items = data.get('items') if isinstance(data, dict) else None
+        if not isinstance(items, list):
+            self.send_json(400, {'error': "Expected an object with an 'items' array"})
+            counters.record(errors=1, latency=time.perf_counter() - start)
+            return
+        
+        # The request is admitted or rejected as a whole: the first item
+        # needs a free slot, and the rest then wait for slots as earlier
+        # conversions finish, so a bulk larger than --max-pending succeeds
+        pending = []
+        admitted = False
+        for position, item in enumerate(items):
+            item_id = item.get('id', position) if isinstance(item, dict) else position
+            try:
+                tasks, show_timestamps = parse_item(item)
+            except ValueError as e:
+                pending.append((item_id, None, str(e)))
+                continue
+            output_format = item.get('format', 'markdown') if isinstance(item, dict) else 'markdown'
+            future = self.service.submit(output_format, tasks, show_timestamps, wait=admitted)
+            if future is None:
+                self.send_json(503, {'error': "Server busy, try again later"})
+                counters.record(rejected=1, latency=time.perf_counter() - start)
+                return
+            admitted = True
+            pending.append((item_id, future, None))
+        
+        results = []
+        errors = 0
+        for item_id, future, error in pending:
+            if future is not None:
+                try:
+                    results.append({'id': item_id, 'output': future.result()})
+                    continue
+                except Exception as e:
+                    error = str(e)
+            errors += 1
+            results.append({'id': item_id, 'error': error})
+        
+        self.send_json(200, {'results': results})
+        counters.record(items=len(results) - errors, errors=errors,
+                        latency=time.perf_counter() - start)
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, service=None, verbose=False):
+    """Create the HTTP server bound to a ConversionService."""
+    service = service or ConversionService()
+    handler = type('BoundConversionHandler', (ConversionHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.verbose = verbose
+    return server
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, max_pending=DEFAULT_MAX_PENDING,
+          max_bytes=DEFAULT_MAX_BYTES, verbose=False):
+    """Run the conversion server until interrupted."""
+    service = ConversionService(workers, max_pending, max_bytes)
+    server = make_server(host, port, service, verbose)
+    print(f"Serving on http://{server.server_address[0]}:{server.server_address[1]} "
+          f"with {service.workers} workers (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Serve Goblin Markdown conversions over local HTTP.")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"address to bind (default: {DEFAULT_HOST})")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"port to bind (default: {DEFAULT_PORT})")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                        help=f"conversions queued at once before rejecting (default: {DEFAULT_MAX_PENDING})")
+    parser.add_argument('--max-bytes', type=int, default=DEFAULT_MAX_BYTES,
+                        help=f"largest request body accepted (default: {DEFAULT_MAX_BYTES})")
+    parser.add_argument('-v', '--verbose', action='store_true', help="log every request")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    serve(args.host, args.port, args.workers, args.max_pending, args.max_bytes, args.verbose)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
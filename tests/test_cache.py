@@ -0,0 +1,55 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from goblin_markdown_cli import main
+
+TASKS = [
+    {'id': 'r', 'text': 'Project', 'parentId': None},
+    {'id': 'a', 'text': 'Draft', 'parentId': 'r'},
+    {'id': 's', 'text': 'Errands', 'parentId': None}
+]
+
+class SplitCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input_file = os.path.join(self.directory.name, 'tasks.json')
+        self.cache_file = os.path.join(self.directory.name, 'cache.json')
+        self.note_file = os.path.join(self.directory.name, 'tasks', 'Project.md')
+        with open(self.input_file, 'w', encoding='utf-8') as f:
+            json.dump(TASKS, f)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def convert(self):
+        with redirect_stdout(StringIO()):
+            main([self.input_file, '--split', '--cache', self.cache_file])
+
+    def read_note(self):
+        with open(self.note_file, encoding='utf-8') as f:
+            return f.read()
+
+    def test_deleted_note_is_restored(self):
+        self.convert()
+        expected = self.read_note()
+        os.remove(self.note_file)
+        self.convert()
+        self.assertEqual(self.read_note(), expected)
+
+    def test_edited_note_is_restored(self):
+        self.convert()
+        expected = self.read_note()
+        with open(self.note_file, 'a', encoding='utf-8') as f:
+            f.write("edited\n")
+        self.convert()
+        self.assertEqual(self.read_note(), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from goblin_markdown_cli import convert_file
+from goblin_markdown_converter import sync_markdown_to_tasks
+
+TASKS = [
+    {'id': 'r', 'text': 'Project', 'parentId': None, 'timestamp': 1700000000000},
+    {'id': 'a', 'text': 'Draft', 'parentId': 'r', 'estimate': 1800, 'timestamp': 1700000060000,
+     'completed': False},
+    {'id': 'b', 'text': 'Review (Created: later)', 'parentId': 'r', 'timestamp': 1700000120000},
+    {'id': 'c', 'text': 'Ship', 'parentId': 'a', 'timestamp': 1700000180000,
+     'meta': {'completed': False}, 'completed': True},
+    {'id': 'd', 'text': 'Draft', 'parentId': 'r', 'timestamp': 1700000240000, 'completed': True}
+]
+
+class SyncMarkdownToTasksTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input_file = os.path.join(self.directory.name, 'tasks.json')
+        self.markdown_file = os.path.join(self.directory.name, 'tasks.md')
+        with open(self.input_file, 'w', encoding='utf-8') as f:
+            json.dump(TASKS, f, indent=2)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read_markdown(self):
+        with open(self.markdown_file, encoding='utf-8') as f:
+            return f.read()
+
+    def toggle(self, *texts):
+        """Flip the checkbox of the first item starting with each text."""
+        lines = self.read_markdown().split("\n")
+        for text in texts:
+            for number, line in enumerate(lines):
+                item = line.lstrip()
+                if item[6:].startswith(text) and item[:3] == '- [':
+                    checked = '[ ]' if item[3] == 'x' else '[x]'
+                    lines[number] = line.replace(item[2:5], checked, 1)
+                    break
+            else:
+                self.fail(f"No item {text!r}")
+        with open(self.markdown_file, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines))
+
+    def completed(self):
+        with open(self.input_file, encoding='utf-8') as f:
+            return {task['id']: bool(task.get('completed')) for task in json.load(f)}
+
+    def round_trip(self, **options):
+        convert_file(self.input_file, **options)
+        self.toggle('Review', 'Ship', 'Draft')
+        edited = self.read_markdown()
+        report = sync_markdown_to_tasks(self.markdown_file, self.input_file)
+        self.assertEqual(report, {'items': 4, 'matched': 4, 'unmatched': 0, 'updated': 3})
+        self.assertEqual(self.completed(), {'r': False, 'a': True, 'b': True, 'c': False, 'd': True})
+
+        # Converting again reproduces the edited document, and syncing it changes nothing
+        convert_file(self.input_file, **options)
+        self.assertEqual(self.read_markdown(), edited)
+        with open(self.input_file, 'rb') as f:
+            before = f.read()
+        self.assertEqual(sync_markdown_to_tasks(self.markdown_file, self.input_file)['updated'], 0)
+        with open(self.input_file, 'rb') as f:
+            self.assertEqual(f.read(), before)
+
+    def test_round_trip_with_id_markers(self):
+        self.round_trip(id_markers=True)
+
+    def test_round_trip_by_text(self):
+        self.round_trip()
+
+    def test_round_trip_by_text_with_timestamps(self):
+        self.round_trip(show_timestamps=True)
+
+    def test_only_completed_values_change(self):
+        convert_file(self.input_file, id_markers=True)
+        self.toggle('Ship')
+        sync_markdown_to_tasks(self.markdown_file, self.input_file)
+        with open(self.input_file, encoding='utf-8') as f:
+            tasks = json.load(f)
+        self.assertEqual(tasks[3]['meta'], {'completed': False})
+        self.assertEqual(tasks[3]['completed'], False)
+        self.assertEqual([{**task, 'completed': None} for task in tasks],
+                         [{**task, 'completed': None} for task in TASKS])
+
+    def test_unknown_items_are_reported(self):
+        convert_file(self.input_file)
+        with open(self.markdown_file, 'a', encoding='utf-8') as f:
+            f.write("\n  - [x] Not in the export\n")
+        report = sync_markdown_to_tasks(self.markdown_file, self.input_file)
+        self.assertEqual(report['unmatched'], 1)
+        self.assertEqual(report['updated'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from goblin_markdown_cli import render_markdown_incremental
+from goblin_markdown_converter import build_task_tree, convert_json_to_markdown
+
+def task(task_id, parent_id=None):
+    return {'id': task_id, 'text': task_id, 'parentId': parent_id}
+
+class RenderMarkdownIncrementalTest(unittest.TestCase):
+    def render(self, state, tasks):
+        return render_markdown_incremental(build_task_tree(tasks), state)
+
+    def test_unchanged_sections_are_reused(self):
+        state = {}
+        tasks = [task('R'), task('A', 'R'), task('S')]
+        self.render(state, tasks)
+        document, re_rendered = self.render(state, tasks + [task('B', 'S')])
+        self.assertEqual(document, convert_json_to_markdown(tasks + [task('B', 'S')]))
+        self.assertEqual(re_rendered, 1)
+
+    def test_reordered_siblings_are_re_rendered(self):
+        state = {}
+        self.render(state, [task('R'), task('A', 'R'), task('B', 'R')])
+        reordered = [task('R'), task('B', 'R'), task('A', 'R')]
+        document, re_rendered = self.render(state, reordered)
+        self.assertEqual(document, convert_json_to_markdown(reordered))
+        self.assertEqual(re_rendered, 1)
+
+    def test_reordered_roots_keep_their_sections(self):
+        state = {}
+        self.render(state, [task('R'), task('A', 'R'), task('S')])
+        reordered = [task('S'), task('R'), task('A', 'R')]
+        document, re_rendered = self.render(state, reordered)
+        self.assertEqual(document, convert_json_to_markdown(reordered))
+        self.assertEqual(re_rendered, 0)
+
+if __name__ == '__main__':
+    unittest.main()